@@ -0,0 +1,58 @@
+import logging
+import threading
+
+from config import ADMIN_CACHE_TTL
+from database import ADMINS_CHANNEL, get_all_admins
+from notifications import notification_listener
+
+logger = logging.getLogger(__name__)
+
+
+class AdminCache:
+    """In-memory set of admin Telegram IDs.
+
+    Reloaded on NOTIFY from add_admin and, as a fallback for changes made
+    directly in the database, every ADMIN_CACHE_TTL seconds.
+    """
+
+    def __init__(self, ttl: float = ADMIN_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._admins: frozenset[int] = frozenset()
+        self._refresher: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def is_admin(self, telegram_id: int) -> bool:
+        return telegram_id in self._admins
+
+    def reload(self) -> None:
+        admins = get_all_admins()
+        if admins is None:
+            # An empty set would lock every admin out until the next reload
+            logger.error("Admin cache reload failed, keeping the previous admins")
+            return
+        self._admins = frozenset(admin[1] for admin in admins)
+
+    def start(self) -> None:
+        self.reload()
+        logger.info(f"Admin cache loaded: {len(self._admins)} admins")
+        notification_listener.subscribe(
+            ADMINS_CHANNEL, lambda _: self.reload(), resync=self.reload
+        )
+        self._stopped.clear()
+        self._refresher = threading.Thread(
+            target=self._refresh_periodically, name="admin-cache-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=1)
+            self._refresher = None
+
+    def _refresh_periodically(self) -> None:
+        while not self._stopped.wait(self.ttl):
+            self.reload()
+
+
+admin_cache = AdminCache()
@@ -1,4 +1,5 @@
 import asyncio
+import atexit
 import logging
 import os
 import threading
@@ -6,17 +7,62 @@ from flask import Flask, request, Response
 from telegram import Update
 from telegram.ext import Application, CommandHandler
 
-from config import BOT_TOKEN, WEBHOOK_URL, PORT
-from database import init_db
+from config import (
+    BOT_API_BASE_URL,
+    BOT_TOKEN,
+    PORT,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_QUEUE_MODE,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_URL,
+    WEBHOOK_WORKERS,
+)
+from admin_cache import admin_cache
+from async_database import run_db, shutdown_executor
+from broadcast import BROADCAST_ENGINE_KEY, BroadcastEngine
+from catalog import video_catalog
+from dedup import update_deduplicator
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    InstrumentedRequest,
+    instrument_handlers,
+    render as render_metrics,
+    watch_update_queue,
+)
+from loop_watchdog import loop_watchdog
+from notifications import notification_listener
+from outbound import outbound_scheduler
+from query_trace import DB_TRACE, TracingApplication, trace_handlers
+from database import close_pool, init_db
 from handlers.admin import (
     admin_add_video_handler,
     admin_command,
     admin_delete_user_callback_handler,
     admin_delete_video_callback_handler,
+    admin_export_users_command_handler,
+    admin_export_users_handler,
+    admin_import_users_handler,
     admin_manage_videos_handler,
+    admin_search_users_handler,
+    admin_top_videos_command_handler,
+    admin_top_videos_handler,
+    admin_users_page_callback_handler,
+    admin_users_selection_callback_handler,
+    admin_videos_selection_callback_handler,
     admin_view_users_handler,
 )
-from handlers.user import registration_handler, video_selection_handler
+from handlers.user import (
+    inline_search_handler,
+    registration_handler,
+    video_callback_handler,
+    video_selection_handler,
+    videos_page_callback_handler,
+)
+from persistence import PostgresPersistence, persistence_refresh_handler
+from update_queue import UpdateQueue
+from user_registry import user_registry
+from view_analytics import view_recorder
+from webhook_filter import SECRET_HEADER, WEBHOOK_FILTER_KEY, WebhookFilter
 
 # Configure logging
 logging.basicConfig(
@@ -27,7 +73,9 @@ logger = logging.getLogger(__name__)
 
 """
 Alwaysdata WSGI entry point:
-Expose the Flask instance as `application`.
+Expose the Flask instance as `application`. The bot is started lazily on the
+first request of each worker process, and conversation state lives in
+Postgres, so any number of workers can serve the same webhook.
 """
 
 # Initialize Flask app
@@ -37,6 +85,8 @@ application = Flask(__name__)
 telegram_app = None
 event_loop = None
 loop_thread = None
+update_queue = None
+_init_lock = threading.Lock()
 
 
 def setup_application() -> Application:
@@ -47,33 +97,133 @@ def setup_application() -> Application:
     init_db()
     
     # Build application
-    telegram_app = Application.builder().token(BOT_TOKEN).build()
+    builder = Application.builder()
+    if DB_TRACE:
+        builder = builder.application_class(TracingApplication)
+    telegram_app = (
+        builder
+        .token(BOT_TOKEN)
+        .base_url(BOT_API_BASE_URL)
+        # Same pool size PTB picks by default, plus Bot API timing
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .rate_limiter(outbound_scheduler)
+        .persistence(PostgresPersistence())
+        .build()
+    )
     
     # Register all handlers
+    telegram_app.add_handler(persistence_refresh_handler, group=-1)
     telegram_app.add_handler(admin_delete_user_callback_handler, group=0)
     telegram_app.add_handler(admin_delete_video_callback_handler, group=0)
     telegram_app.add_handler(admin_add_video_handler, group=0)
     telegram_app.add_handler(admin_view_users_handler, group=0)
+    telegram_app.add_handler(admin_search_users_handler, group=0)
+    telegram_app.add_handler(admin_users_page_callback_handler, group=0)
+    telegram_app.add_handler(admin_users_selection_callback_handler, group=0)
     telegram_app.add_handler(admin_manage_videos_handler, group=0)
+    telegram_app.add_handler(admin_videos_selection_callback_handler, group=0)
+    telegram_app.add_handler(admin_top_videos_handler, group=0)
+    telegram_app.add_handler(admin_top_videos_command_handler, group=0)
+    telegram_app.add_handler(admin_export_users_handler, group=0)
+    telegram_app.add_handler(admin_export_users_command_handler, group=0)
+    telegram_app.add_handler(admin_import_users_handler, group=0)
     telegram_app.add_handler(CommandHandler("admin", admin_command), group=0)
     telegram_app.add_handler(registration_handler, group=1)
     telegram_app.add_handler(video_selection_handler, group=2)
+    telegram_app.add_handler(video_callback_handler, group=2)
+    telegram_app.add_handler(videos_page_callback_handler, group=2)
+    telegram_app.add_handler(inline_search_handler, group=2)
+
+    telegram_app.bot_data[BROADCAST_ENGINE_KEY] = BroadcastEngine(telegram_app)
+    telegram_app.bot_data[WEBHOOK_FILTER_KEY] = WebhookFilter(telegram_app)
+    instrument_handlers(telegram_app)
+    if DB_TRACE:
+        trace_handlers(telegram_app)
     
     logger.info("Telegram application setup complete")
     return telegram_app
 
 
+def get_telegram_app() -> Application:
+    """Return this process's running bot, starting it on first use."""
+    global telegram_app, event_loop, loop_thread, update_queue
+    if telegram_app is not None:
+        return telegram_app
+
+    with _init_lock:
+        if telegram_app is None:
+            bot_app = setup_application()
+
+            # Start background event loop
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_start_event_loop, args=(loop,), daemon=True)
+            thread.start()
+
+            # Initialize and start the application
+            update_queue = asyncio.run_coroutine_threadsafe(
+                start_bot(bot_app), loop
+            ).result()
+            event_loop = loop
+            loop_thread = thread
+            telegram_app = bot_app
+            atexit.register(_stop_worker)
+    return telegram_app
+
+
+def _stop_worker() -> None:
+    """Stop this worker's bot at interpreter exit, leaving the webhook in place."""
+    if telegram_app is None or not telegram_app.running:
+        return
+    asyncio.run_coroutine_threadsafe(
+        stop_bot(telegram_app, update_queue, delete_webhook=False), event_loop
+    ).result()
+    event_loop.call_soon_threadsafe(event_loop.stop)
+    loop_thread.join(timeout=5)
+    shutdown_executor()
+    close_pool()
+
+
 @application.route("/webhook", methods=["POST"])
 def webhook():
     """Handle incoming webhook updates from Telegram."""
+    # Set once claimed; any non-2xx reply after that must release it, or
+    # Telegram's redelivery would be dropped as a duplicate
+    claimed_id = None
     try:
+        bot_app = get_telegram_app()
+        webhook_filter = bot_app.bot_data[WEBHOOK_FILTER_KEY]
+        if not webhook_filter.check_secret(request.headers.get(SECRET_HEADER)):
+            return Response(status=403)
+
         # Parse incoming update
         update_data = request.get_json(force=True)
-        update = Update.de_json(update_data, telegram_app.bot)
+        if not webhook_filter.wants(update_data):
+            return Response(status=200)
+
+        update_id = update_data.get("update_id") if isinstance(update_data, dict) else None
+        if update_id is not None:
+            if not update_deduplicator.claim(update_id):
+                logger.info(f"Dropped redelivered update: {update_id}")
+                return Response(status=200)
+            claimed_id = update_id
+
+        update = Update.de_json(update_data, bot_app.bot)
+        if update is None:
+            _release(claimed_id)
+            return Response(status=400)
+
+        if update_queue is not None:
+            # Acknowledge right away; workers process the update later
+            if not update_queue.put(update):
+                logger.warning(f"Update queue full, rejecting update: {update.update_id}")
+                # Telegram will resend it, so it must not count as seen
+                _release(claimed_id)
+                return Response(status=503)
+            return Response(status=200)
         
         # Process update asynchronously on the bot event loop
         future = asyncio.run_coroutine_threadsafe(
-            telegram_app.process_update(update), event_loop
+            bot_app.process_update(update), event_loop
         )
         future.result()
         
@@ -82,9 +232,15 @@ def webhook():
     
     except Exception as e:
         logger.error(f"Error processing update: {e}")
+        _release(claimed_id)
         return Response(status=500)
 
 
+def _release(update_id: int | None) -> None:
+    if update_id is not None:
+        update_deduplicator.release(update_id)
+
+
 @application.route("/")
 def index():
     """Health check endpoint."""
@@ -94,31 +250,91 @@ def index():
 @application.route("/health")
 def health():
     """Health check for monitoring."""
-    return {"status": "ok", "bot": "running"}
+    status = {"status": "ok", "bot": "running"}
+    status["duplicates_dropped"] = update_deduplicator.duplicates
+    status["loop"] = loop_watchdog.stats()
+    status["outbound"] = outbound_scheduler.stats()
+    if telegram_app is not None:
+        status["filter"] = telegram_app.bot_data[WEBHOOK_FILTER_KEY].stats()
+    if update_queue is not None:
+        status["queue"] = update_queue.stats()
+    return status
 
 
-async def setup_webhook():
+@application.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+async def setup_webhook(bot_app: Application):
     """Set up the webhook for Telegram."""
     try:
-        logger.info(f"Setting webhook to: {WEBHOOK_URL}")
-        await telegram_app.bot.set_webhook(url=WEBHOOK_URL)
-        webhook_info = await telegram_app.bot.get_webhook_info()
+        webhook_filter = bot_app.bot_data[WEBHOOK_FILTER_KEY]
+        logger.info(
+            f"Setting webhook to: {WEBHOOK_URL} for {', '.join(webhook_filter.allowed_updates)}"
+        )
+        await bot_app.bot.set_webhook(
+            url=WEBHOOK_URL,
+            allowed_updates=webhook_filter.allowed_updates,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            secret_token=webhook_filter.secret,
+        )
+        webhook_info = await bot_app.bot.get_webhook_info()
         logger.info(f"Webhook set successfully: {webhook_info.url}")
     except Exception as e:
         logger.error(f"Failed to set webhook: {e}")
         raise
 
 
-async def remove_webhook():
+async def remove_webhook(bot_app: Application):
     """Remove webhook on shutdown."""
     try:
         logger.info("Removing webhook...")
-        await telegram_app.bot.delete_webhook()
+        await bot_app.bot.delete_webhook()
         logger.info("Webhook removed")
     except Exception as e:
         logger.error(f"Failed to remove webhook: {e}")
 
 
+async def start_bot(bot_app: Application):
+    """Start the bot on the running loop; returns the update queue in queue mode."""
+    await run_db(video_catalog.start)
+    await run_db(user_registry.start)
+    await run_db(admin_cache.start)
+    bot_app.persistence.start()
+    notification_listener.start()
+    await bot_app.initialize()
+    await bot_app.start()
+    queue = None
+    if WEBHOOK_QUEUE_MODE:
+        queue = UpdateQueue(bot_app, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS)
+        await queue.start()
+    watch_update_queue(queue)
+    loop_watchdog.start()
+    view_recorder.start()
+    await setup_webhook(bot_app)
+    bot_app.bot_data[BROADCAST_ENGINE_KEY].start()
+    return queue
+
+
+async def stop_bot(bot_app: Application, queue, delete_webhook: bool = True) -> None:
+    """Stop the bot started by `start_bot`."""
+    if delete_webhook:
+        await remove_webhook(bot_app)
+    await loop_watchdog.stop()
+    if queue is not None:
+        await queue.stop()
+    # After the queue, so views recorded by its last updates are written too
+    await view_recorder.stop()
+    # Before bot_app.stop(), which would otherwise wait for every broadcast to finish
+    await bot_app.bot_data[BROADCAST_ENGINE_KEY].stop()
+    await bot_app.stop()
+    await bot_app.shutdown()
+    notification_listener.stop()
+    admin_cache.stop()
+
+
 def _start_event_loop(loop: asyncio.AbstractEventLoop) -> None:
     asyncio.set_event_loop(loop)
     loop.run_forever()
@@ -126,22 +342,10 @@ def _start_event_loop(loop: asyncio.AbstractEventLoop) -> None:
 
 def main():
     """Main function to start the Flask application."""
-    global telegram_app, event_loop, loop_thread
-    
     logger.info("Starting Telegram bot in webhook mode...")
     
-    # Setup application
-    telegram_app = setup_application()
-    
-    # Start background event loop
-    event_loop = asyncio.new_event_loop()
-    loop_thread = threading.Thread(target=_start_event_loop, args=(event_loop,), daemon=True)
-    loop_thread.start()
-
-    # Initialize and start the application
-    asyncio.run_coroutine_threadsafe(telegram_app.initialize(), event_loop).result()
-    asyncio.run_coroutine_threadsafe(telegram_app.start(), event_loop).result()
-    asyncio.run_coroutine_threadsafe(setup_webhook(), event_loop).result()
+    # Setup and start the application
+    get_telegram_app()
     
     logger.info(f"Starting Flask server on port {PORT}...")
     
@@ -152,8 +356,10 @@ def main():
         logger.info("Shutting down...")
     finally:
         # Cleanup
-        asyncio.run_coroutine_threadsafe(remove_webhook(), event_loop).result()
-        asyncio.run_coroutine_threadsafe(telegram_app.stop(), event_loop).result()
-        asyncio.run_coroutine_threadsafe(telegram_app.shutdown(), event_loop).result()
+        asyncio.run_coroutine_threadsafe(
+            stop_bot(telegram_app, update_queue), event_loop
+        ).result()
         event_loop.call_soon_threadsafe(event_loop.stop)
         loop_thread.join(timeout=5)
+        shutdown_executor()
+        close_pool()
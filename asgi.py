@@ -0,0 +1,195 @@
+import json
+import logging
+
+from telegram import Update
+
+from app import setup_application, start_bot, stop_bot
+from async_database import run_db, shutdown_executor
+from config import PORT
+from database import close_pool
+from dedup import update_deduplicator
+from loop_watchdog import loop_watchdog
+from outbound import outbound_scheduler
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from webhook_filter import SECRET_HEADER, WEBHOOK_FILTER_KEY
+
+logger = logging.getLogger(__name__)
+
+"""
+Native ASGI entry point:
+Serves /webhook, /health and / on the same event loop as the bot, so updates
+are processed without a thread hop. Run with `uvicorn asgi:app` or
+`python asgi.py`.
+"""
+
+telegram_app = None
+update_queue = None
+
+
+async def startup() -> None:
+    global telegram_app, update_queue
+    telegram_app = setup_application()
+    update_queue = await start_bot(telegram_app)
+
+
+async def shutdown() -> None:
+    await stop_bot(telegram_app, update_queue)
+    shutdown_executor()
+    close_pool()
+
+
+async def webhook(body: bytes) -> int:
+    """Handle incoming webhook updates from Telegram."""
+    # Set once claimed; any non-2xx reply after that must release it, or
+    # Telegram's redelivery would be dropped as a duplicate
+    claimed_id = None
+    try:
+        update_data = json.loads(body)
+        if not telegram_app.bot_data[WEBHOOK_FILTER_KEY].wants(update_data):
+            return 200
+
+        update_id = update_data.get("update_id") if isinstance(update_data, dict) else None
+        if update_id is not None:
+            if not await _claim(update_id):
+                logger.info(f"Dropped redelivered update: {update_id}")
+                return 200
+            claimed_id = update_id
+
+        update = Update.de_json(update_data, telegram_app.bot)
+        if update is None:
+            await _release(claimed_id)
+            return 400
+
+        if update_queue is not None:
+            if not update_queue.put(update):
+                logger.warning(f"Update queue full, rejecting update: {update.update_id}")
+                # Telegram will resend it, so it must not count as seen
+                await _release(claimed_id)
+                return 503
+            return 200
+
+        await telegram_app.process_update(update)
+        logger.info(f"Processed update: {update.update_id}")
+        return 200
+
+    except Exception as e:
+        logger.error(f"Error processing update: {e}")
+        await _release(claimed_id)
+        return 500
+
+
+async def _claim(update_id: int) -> bool:
+    # The Postgres store does a round trip; keep it off the event loop
+    if update_deduplicator.shared:
+        return await run_db(update_deduplicator.claim, update_id)
+    return update_deduplicator.claim(update_id)
+
+
+async def _release(update_id: int | None) -> None:
+    if update_id is None:
+        return
+    if update_deduplicator.shared:
+        await run_db(update_deduplicator.release, update_id)
+    else:
+        update_deduplicator.release(update_id)
+
+
+def health() -> dict:
+    status = {"status": "ok", "bot": "running"}
+    status["duplicates_dropped"] = update_deduplicator.duplicates
+    status["loop"] = loop_watchdog.stats()
+    status["outbound"] = outbound_scheduler.stats()
+    status["filter"] = telegram_app.bot_data[WEBHOOK_FILTER_KEY].stats()
+    if update_queue is not None:
+        status["queue"] = update_queue.stats()
+    return status
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    method = scope["method"]
+    if path == "/webhook" and method == "POST":
+        # Forged requests are refused before their body is read
+        secret = _header(scope, _SECRET_HEADER_KEY)
+        if not telegram_app.bot_data[WEBHOOK_FILTER_KEY].check_secret(secret):
+            await _respond(send, 403)
+            return
+        status = await webhook(await _read_body(receive))
+        await _respond(send, status)
+    elif path == "/health" and method == "GET":
+        await _respond(
+            send, 200, json.dumps(health()).encode(), b"application/json"
+        )
+    elif path == "/metrics" and method == "GET":
+        await _respond(
+            send, 200, render_metrics().encode(), METRICS_CONTENT_TYPE.encode()
+        )
+    elif path == "/" and method == "GET":
+        await _respond(send, 200, b"Telegram Bot is running!")
+    else:
+        await _respond(send, 404)
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await startup()
+            except Exception as e:
+                logger.error(f"Startup failed: {e}")
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+_SECRET_HEADER_KEY = SECRET_HEADER.lower().encode()
+
+
+def _header(scope, name: bytes) -> bytes | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def _respond(
+    send, status: int, body: bytes = b"", content_type: bytes = b"text/plain; charset=utf-8"
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from metrics import call_timed
+
+# One worker per pooled connection, so a worker never waits on the pool itself.
+_executor = ThreadPoolExecutor(
+    max_workers=database.DB_POOL_MAX, thread_name_prefix="db"
+)
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database call on the DB executor without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables over, so query tracing knows the current update
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, functools.partial(context.run, call_timed, func, *args, **kwargs)
+    )
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=True)
+
+
+async def get_user_by_telegram_id(telegram_id: int):
+    return await run_db(database.get_user_by_telegram_id, telegram_id)
+
+
+async def create_user(telegram_id: int, name: str, phone: str) -> bool:
+    return await run_db(database.create_user, telegram_id, name, phone)
+
+
+async def create_video(title: str, youtube_link: str) -> None:
+    await run_db(database.create_video, title, youtube_link)
+
+
+async def get_all_videos():
+    return await run_db(database.get_all_videos)
+
+
+async def get_video_by_title(title: str):
+    return await run_db(database.get_video_by_title, title)
+
+
+async def get_all_users():
+    return await run_db(database.get_all_users)
+
+
+async def delete_user_by_telegram_id(telegram_id: int) -> None:
+    await run_db(database.delete_user_by_telegram_id, telegram_id)
+
+
+async def delete_users_by_telegram_ids(telegram_ids):
+    return await run_db(database.delete_users_by_telegram_ids, telegram_ids)
+
+
+async def get_all_videos_with_id():
+    return await run_db(database.get_all_videos_with_id)
+
+
+async def delete_video_by_id(video_id: int) -> None:
+    await run_db(database.delete_video_by_id, video_id)
+
+
+async def get_videos_page(after_id: int, limit: int):
+    return await run_db(database.get_videos_page, after_id, limit)
+
+
+async def get_videos_page_before(before_id: int, limit: int):
+    return await run_db(database.get_videos_page_before, before_id, limit)
+
+
+async def delete_videos_by_ids(video_ids):
+    return await run_db(database.delete_videos_by_ids, video_ids)
+
+
+async def add_admin(telegram_id: int) -> None:
+    await run_db(database.add_admin, telegram_id)
+
+
+async def is_admin(telegram_id: int) -> bool:
+    return await run_db(database.is_admin, telegram_id)
+
+
+async def get_all_admins():
+    return await run_db(database.get_all_admins)
+
+
+async def create_broadcast(admin_chat_id: int, text: str):
+    return await run_db(database.create_broadcast, admin_chat_id, text)
+
+
+async def get_running_broadcasts():
+    return await run_db(database.get_running_broadcasts)
+
+
+async def claim_broadcast(broadcast_id: int, owner: str, lease_seconds: float):
+    return await run_db(database.claim_broadcast, broadcast_id, owner, lease_seconds)
+
+
+async def release_broadcast(broadcast_id: int, owner: str) -> None:
+    await run_db(database.release_broadcast, broadcast_id, owner)
+
+
+async def get_pending_recipients(broadcast_id: int, after_telegram_id: int, limit: int):
+    return await run_db(
+        database.get_pending_recipients, broadcast_id, after_telegram_id, limit
+    )
+
+
+async def mark_recipients(broadcast_id: int, results) -> bool:
+    return await run_db(database.mark_recipients, broadcast_id, results)
+
+
+async def get_broadcast_counts(broadcast_id: int):
+    return await run_db(database.get_broadcast_counts, broadcast_id)
+
+
+async def finish_broadcast(broadcast_id: int) -> bool:
+    return await run_db(database.finish_broadcast, broadcast_id)
+
+
+async def load_persistence_rows(keys):
+    return await run_db(database.load_persistence_rows, keys)
+
+
+async def save_persistence_rows(rows, origin: str = ""):
+    return await run_db(database.save_persistence_rows, rows, origin)
+
+
+async def export_users_csv(fileobj):
+    return await run_db(database.export_users_csv, fileobj)
+
+
+async def import_users_csv(fileobj):
+    return await run_db(database.import_users_csv, fileobj)
+
+
+async def get_users_page(after_id: int, limit: int, search: str | None = None):
+    return await run_db(database.get_users_page, after_id, limit, search)
+
+
+async def get_users_page_before(before_id: int, limit: int, search: str | None = None):
+    return await run_db(database.get_users_page_before, before_id, limit, search)
+
+
+async def search_videos(query: str, limit: int):
+    return await run_db(database.search_videos, query, limit)
+
+
+async def record_video_views(views) -> bool:
+    return await run_db(database.record_video_views, views)
+
+
+async def get_top_videos(days: int, limit: int):
+    return await run_db(database.get_top_videos, days, limit)
@@ -0,0 +1,155 @@
+"""
+Users export: fetchall() + csv + gzip vs COPY TO STDOUT into a gzip file.
+
+Seeds a scratch schema with synthetic users, then runs each exporter in a
+fresh subprocess so peak RSS is not shared between runs. Each run also
+uploads the file with sendDocument, through PTB, to benchmarks.fake_bot_api,
+so the figures cover the whole path the admin command takes. While an
+export runs, a writer thread keeps registering users and the slowest
+insert is reported, to show the export does not block writes. Needs the
+DB_* settings of a disposable database. Run from the repository root:
+
+    python -m benchmarks.export_users --size 1000000
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+from telegram import Bot
+
+import database
+from benchmarks.streaming_memory import SCHEMA, seed
+
+API_PORT = 8202
+BOT_TOKEN = "123456:EXPORT-BENCH"
+
+
+async def send(export_file) -> None:
+    base_url = f"http://127.0.0.1:{API_PORT}/bot"
+    async with Bot(BOT_TOKEN, base_url=base_url) as bot:
+        await bot.send_document(chat_id=1, document=export_file, filename="users.csv.gz")
+
+
+def export(mode: str) -> None:
+    """Runs in the child process: export every user and report the results."""
+    stop = threading.Event()
+    insert_times: list[float] = []
+
+    def register_users() -> None:
+        # Distinct per child, so the second run does not hit the first run's ids
+        telegram_id = 900_000_000 + os.getpid() * 10_000
+        while not stop.is_set():
+            telegram_id += 1
+            started = time.perf_counter()
+            database.create_user(telegram_id, "Writer during export", "+998900000000")
+            insert_times.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    writer = threading.Thread(target=register_users, daemon=True)
+    writer.start()
+
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as export_file:
+        with gzip.GzipFile(mode="wb", fileobj=export_file, compresslevel=6) as archive:
+            if mode == "fetchall":
+                rows = database.get_all_users()
+                text = io.TextIOWrapper(archive, encoding="utf-8", newline="")
+                writer_csv = csv.writer(text)
+                writer_csv.writerow(["id", "name", "phone", "telegram_id"])
+                writer_csv.writerows(rows)
+                text.flush()
+                text.detach()
+                count = len(rows)
+            else:
+                count = database.export_users_csv(archive)
+        size = export_file.tell()
+        export_file.seek(0)
+        asyncio.run(send(export_file))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    writer.join()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    slowest_insert = max(insert_times, default=0.0)
+    print(f"{count} {elapsed:.3f} {peak_kb} {size} {len(insert_times)} {slowest_insert:.4f}")
+
+
+def wait_for_api(timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{API_PORT}/stats")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("The fake Bot API did not come up")
+
+
+def measure(mode: str) -> list[str]:
+    env = dict(os.environ, PGOPTIONS=f"-c search_path={SCHEMA},public")
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.export_users", "--child", mode],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.splitlines()[-1].split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--child", choices=["fetchall", "copy"])
+    args = parser.parse_args()
+
+    if args.child:
+        export(args.child)
+        return
+
+    print(
+        f"{'users':>10} {'mode':<9} {'seconds':>8} {'peak RSS MB':>12} "
+        f"{'gzip MB':>8} {'inserts':>8} {'max insert ms':>14}"
+    )
+    api = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_bot_api",
+            "--port", str(API_PORT), "--latency", "0",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_api()
+        seed(args.size)
+        for mode in ("fetchall", "copy"):
+            count, elapsed, peak_kb, size, inserts, slowest = measure(mode)
+            # The writer thread adds a few users on top of the seeded ones
+            assert int(count) >= args.size
+            print(
+                f"{args.size:>10,} {mode:<9} {float(elapsed):>8.2f} "
+                f"{int(peak_kb) / 1024:>12.1f} {int(size) / 1024 / 1024:>8.1f} "
+                f"{inserts:>8} {float(slowest) * 1000:>14.1f}"
+            )
+        uploads = httpx.get(f"http://127.0.0.1:{API_PORT}/stats").json()["calls"]
+        assert uploads.get("sendDocument") == 2
+    finally:
+        api.terminate()
+        conn = database.get_connection()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the Telegram Bot API, for load tests.
+
+Answers every method the bot uses with a minimal valid result after a
+configurable delay, answers a configurable share of sendMessage and
+editMessageText calls with 429, and counts calls per method. GET /stats
+returns the counts as JSON, POST /reset clears them. Run standalone with:
+
+    python -m benchmarks.fake_bot_api --port 8201 --latency 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from urllib.parse import parse_qsl
+
+import uvicorn
+
+RATE_LIMITED_METHODS = frozenset({"sendMessage", "editMessageText"})
+
+BOT_USER = {
+    "id": 123456,
+    "is_bot": True,
+    "first_name": "Bench",
+    "username": "bench_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": True,
+}
+
+
+class FakeBotApi:
+    """ASGI app that plays the Bot API; one instance per server process."""
+
+    def __init__(
+        self, latency: float = 0.0, rate_limit_ratio: float = 0.0, retry_after: int = 1
+    ) -> None:
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+        # Seeded so two runs with the same settings see the same 429s
+        self._random = random.Random(0)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"]
+        if path == "/stats":
+            await _respond(send, 200, self.stats())
+            return
+        if path == "/reset":
+            self.calls.clear()
+            self.rate_limited.clear()
+            await _respond(send, 200, {"ok": True})
+            return
+
+        # /bot<token>/<method>
+        method = path.rsplit("/", 1)[-1]
+        params = _parse_params(await _read_body(receive), scope)
+        self.calls[method] += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in RATE_LIMITED_METHODS and self._random.random() < self.rate_limit_ratio:
+            self.rate_limited[method] += 1
+            await _respond(
+                send,
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+            )
+            return
+
+        await _respond(send, 200, {"ok": True, "result": self._result(method, params)})
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "rate_limited": dict(self.rate_limited)}
+
+    def _result(self, method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method in ("sendMessage", "editMessageText", "editMessageReplyMarkup", "sendDocument"):
+            chat_id = int(params.get("chat_id", 0))
+            return {
+                "message_id": int(params.get("message_id", 0)) or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+
+def _parse_params(body: bytes, scope) -> dict:
+    headers = dict(scope["headers"])
+    content_type = headers.get(b"content-type", b"")
+    if content_type.startswith(b"application/json"):
+        return json.loads(body or b"{}")
+    if content_type.startswith(b"application/x-www-form-urlencoded"):
+        return dict(parse_qsl(body.decode()))
+    # Multipart uploads only need counting
+    return {}
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def _respond(send, status: int, payload) -> None:
+    body = json.dumps(payload).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def serve(port: int, latency: float, rate_limit_ratio: float, retry_after: int) -> None:
+    api = FakeBotApi(latency, rate_limit_ratio, retry_after)
+    uvicorn.run(api, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8201)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per call")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.rate_limit_ratio, args.retry_after)
+
+
+if __name__ == "__main__":
+    main()
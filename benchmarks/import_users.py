@@ -0,0 +1,83 @@
+"""
+Users import: one create_user() call per row vs import_users_csv().
+
+Seeds a scratch schema with synthetic users, then imports a CSV in which
+half the rows update seeded users and half are new, and reports rows per
+second for each path. The per-row path only gets a sample, since it is
+far slower. Needs the DB_* settings of a disposable database. Run from
+the repository root:
+
+    python -m benchmarks.import_users --seeded 500000 --rows 200000
+"""
+import argparse
+import io
+import os
+import time
+
+import database
+from benchmarks.streaming_memory import SCHEMA, seed
+
+# Seeded users have telegram_id 100000000 + n, n from 1
+FIRST_SEEDED_ID = 100_000_001
+
+
+def build_csv(rows: int, first_id: int) -> bytes:
+    lines = ["telegram_id,name,phone"]
+    lines.extend(
+        f"{telegram_id},Imported student {telegram_id},+99891{telegram_id % 10_000_000:07d}"
+        for telegram_id in range(first_id, first_id + rows)
+    )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def run_per_row(payload: bytes) -> int:
+    rows = payload.decode().splitlines()[1:]
+    for row in rows:
+        telegram_id, name, phone = row.split(",")
+        database.create_user(int(telegram_id), name, phone)
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seeded", type=int, default=500_000)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--per-row-sample", type=int, default=2_000)
+    args = parser.parse_args()
+
+    # Half the import overlaps the seeded users, half is new
+    first_id = FIRST_SEEDED_ID + args.seeded - args.rows // 2
+    payload = build_csv(args.rows, first_id)
+
+    print(f"{'path':<12} {'rows':>9} {'seconds':>8} {'rows/s':>9}")
+    try:
+        seed(args.seeded)
+        os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+        database.close_pool()
+
+        started = time.perf_counter()
+        summary = database.import_users_csv(io.BytesIO(payload))
+        elapsed = time.perf_counter() - started
+        assert summary is not None and summary["rejected"] == 0
+        print(f"{'copy upsert':<12} {args.rows:>9,} {elapsed:>8.2f} {args.rows / elapsed:>9,.0f}")
+        print(
+            f"  inserted {summary['inserted']}, updated {summary['updated']}, "
+            f"unchanged {summary['unchanged']}"
+        )
+
+        sample = build_csv(args.per_row_sample, first_id + args.rows)
+        started = time.perf_counter()
+        count = run_per_row(sample)
+        elapsed = time.perf_counter() - started
+        print(f"{'create_user':<12} {count:>9,} {elapsed:>8.2f} {count / elapsed:>9,.0f}")
+    finally:
+        database.close_pool()
+        conn = database.get_connection()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+End-to-end load test: the real bot, a local Postgres and a fake Bot API.
+
+Starts benchmarks.fake_bot_api and the bot (asgi.py under uvicorn, or
+app.main() serving Flask) as subprocesses against a scratch schema. It
+then plays synthetic users through /start, registration, video taps,
+paging and inline search, plus admin sessions, posting signed updates to
+/webhook.
+Each user's updates go in order; users run concurrently.
+
+Reports updates per second, p50/p95/p99 webhook latency per update kind,
+database transactions per update (from pg_stat_database), the bot
+process's peak RSS and the Bot API calls made. The bot runs without
+WEBHOOK_QUEUE_MODE, so the webhook returns only once the update has been
+handled. Needs the DB_* settings of a disposable database and Linux for
+the RSS figure. Run from the repository root:
+
+    python -m benchmarks.load_test --users 500 --concurrency 50 --api-latency 0.05
+
+--max-p95-ms and --min-rate make it exit non-zero on a regression.
+Synthetic users tap far faster than people do, so the outbound
+scheduler's Telegram rate limits are lifted unless --real-limits is given.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+BOT_TOKEN = "123456:BENCHMARK"
+SECRET = "benchmark-secret"
+SCHEMA = "bench_load"
+ADMIN_TELEGRAM_ID = 1
+FIRST_USER_ID = 500_000_000
+API_PORT = 8201
+BOT_PORT = 8202
+
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+
+import database  # noqa: E402  (must see PGOPTIONS before it connects)
+
+
+class UpdateFactory:
+    def __init__(self) -> None:
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, telegram_id: int) -> dict:
+        return {"id": telegram_id, "is_bot": False, "first_name": f"Bench {telegram_id}"}
+
+    def message(self, telegram_id: int, text: str | None = None, **fields) -> dict:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": telegram_id, "type": "private"},
+            "from": self._user(telegram_id),
+            **fields,
+        }
+        if text is not None:
+            message["text"] = text
+            if text.startswith("/"):
+                command_length = len(text.split()[0])
+                message["entities"] = [
+                    {"type": "bot_command", "offset": 0, "length": command_length}
+                ]
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def contact(self, telegram_id: int) -> dict:
+        phone = f"+99890{telegram_id % 10_000_000:07d}"
+        contact = {"phone_number": phone, "first_name": "Bench", "user_id": telegram_id}
+        return self.message(telegram_id, contact=contact)
+
+    def callback(self, telegram_id: int, data: str) -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "from": self._user(telegram_id),
+                "chat_instance": str(telegram_id),
+                "data": data,
+                "message": {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": telegram_id, "type": "private"},
+                    "text": "menu",
+                },
+            },
+        }
+
+    def inline_query(self, telegram_id: int, query: str) -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "inline_query": {
+                "id": str(next(self._message_ids)),
+                "from": self._user(telegram_id),
+                "query": query,
+                "offset": "",
+            },
+        }
+
+
+def user_session(factory: UpdateFactory, telegram_id: int, videos) -> list[tuple[str, dict]]:
+    video_id, title = videos[telegram_id % len(videos)]
+    return [
+        ("start", factory.message(telegram_id, "/start")),
+        ("name", factory.message(telegram_id, f"Bench User {telegram_id}")),
+        ("contact", factory.contact(telegram_id)),
+        ("video_tap", factory.callback(telegram_id, f"video_{video_id}")),
+        ("videos_page", factory.callback(telegram_id, "videos_page_1")),
+        ("title_tap", factory.message(telegram_id, title)),
+        ("inline_search", factory.inline_query(telegram_id, title.split()[0])),
+        ("start_again", factory.message(telegram_id, "/start")),
+    ]
+
+
+def admin_session(factory: UpdateFactory) -> list[tuple[str, dict]]:
+    return [
+        ("admin", factory.message(ADMIN_TELEGRAM_ID, "/admin")),
+        ("view_users", factory.message(ADMIN_TELEGRAM_ID, "View Users")),
+        ("users_page", factory.callback(ADMIN_TELEGRAM_ID, "users_next_0")),
+        ("users_search", factory.message(ADMIN_TELEGRAM_ID, "/users Bench")),
+    ]
+
+
+def seed(videos: int) -> list[tuple[int, str]]:
+    conn = database.get_connection()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    conn.close()
+
+    database.migrate()
+    database.add_admin(ADMIN_TELEGRAM_ID)
+    with database.get_cursor(commit=True) as cur:
+        cur.execute(
+            "INSERT INTO videos (title, youtube_link) "
+            "SELECT 'Lesson ' || n || ' algebra', 'https://youtu.be/bench' || n "
+            "FROM generate_series(1, %s) AS n RETURNING id, title",
+            (videos,),
+        )
+        return cur.fetchall()
+
+
+def drop_schema() -> None:
+    database.close_pool()
+    conn = database.get_connection()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    conn.close()
+
+
+def db_transactions() -> int:
+    # Backends publish their counters when they go idle, at most once a second
+    time.sleep(1.5)
+    conn = database.get_connection()
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT xact_commit + xact_rollback FROM pg_stat_database "
+            "WHERE datname = current_database()"
+        )
+        (count,) = cur.fetchone()
+    conn.close()
+    return count
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_processes(args, log_file):
+    api = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_bot_api",
+            "--port", str(API_PORT),
+            "--latency", str(args.api_latency),
+            "--rate-limit-ratio", str(args.rate_limit_ratio),
+        ],
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    env = {
+        **os.environ,
+        "BOT_TOKEN": BOT_TOKEN,
+        "BOT_API_BASE_URL": f"http://127.0.0.1:{API_PORT}/bot",
+        "WEBHOOK_URL": f"http://127.0.0.1:{BOT_PORT}/webhook",
+        "WEBHOOK_SECRET_TOKEN": SECRET,
+        "WEBHOOK_QUEUE_MODE": "false",
+        "PORT": str(BOT_PORT),
+    }
+    if not args.real_limits:
+        env.update(
+            OUTBOUND_GLOBAL_RATE="100000",
+            OUTBOUND_CHAT_RATE="100000",
+            OUTBOUND_GROUP_RATE="100000",
+            OUTBOUND_CHAT_BURST="100000",
+        )
+    if args.server == "asgi":
+        command = [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--port", str(BOT_PORT), "--log-level", "warning",
+        ]
+    else:
+        command = [sys.executable, "-c", "import app; app.main()"]
+    bot = subprocess.Popen(command, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    return api, bot
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode}")
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run_load(sessions, concurrency: int):
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    pending = iter(sessions)
+    url = f"http://127.0.0.1:{BOT_PORT}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+    async with httpx.AsyncClient(timeout=60, headers=headers) as client:
+
+        async def worker() -> None:
+            for session in pending:
+                for kind, update in session:
+                    started = time.perf_counter()
+                    response = await client.post(url, json=update)
+                    latencies[kind].append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors[kind] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, errors
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def report(elapsed, latencies, errors, transactions, rss_mb, api_stats) -> dict:
+    every = sorted(value for values in latencies.values() for value in values)
+    total = len(every)
+    summary = {
+        "updates": total,
+        "rate": total / elapsed,
+        "p50_ms": statistics.median(every) * 1000,
+        "p95_ms": percentile(every, 0.95) * 1000,
+        "p99_ms": percentile(every, 0.99) * 1000,
+        "db_transactions_per_update": transactions / total,
+        "peak_rss_mb": rss_mb,
+    }
+
+    print(f"{'kind':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for kind, values in latencies.items():
+        values.sort()
+        print(
+            f"{kind:<14}{len(values):>7}{statistics.median(values) * 1000:>10.1f}"
+            f"{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}"
+            f"{errors.get(kind, 0):>8}"
+        )
+    print()
+    print(f"updates         {total} in {elapsed:.2f}s = {summary['rate']:.1f}/s")
+    print(
+        f"latency         p50 {summary['p50_ms']:.1f} ms   p95 {summary['p95_ms']:.1f} ms"
+        f"   p99 {summary['p99_ms']:.1f} ms"
+    )
+    print(f"db              {summary['db_transactions_per_update']:.2f} transactions/update")
+    print(f"bot peak RSS    {rss_mb:.1f} MB")
+    print(f"bot api calls   {api_stats['calls']}")
+    if api_stats["rate_limited"]:
+        print(f"bot api 429s    {api_stats['rate_limited']}")
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--admin-every", type=int, default=20, help="one admin session per N users")
+    parser.add_argument("--server", choices=("asgi", "flask"), default="asgi")
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument(
+        "--real-limits", action="store_true", help="keep Telegram's per-chat and global rates"
+    )
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--min-rate", type=float, help="minimum updates per second")
+    parser.add_argument("--keep-schema", action="store_true")
+    args = parser.parse_args()
+
+    videos = seed(args.videos)
+    factory = UpdateFactory()
+    sessions = []
+    for index in range(args.users):
+        sessions.append(user_session(factory, FIRST_USER_ID + index, videos))
+        if args.admin_every and index % args.admin_every == args.admin_every - 1:
+            sessions.append(admin_session(factory))
+
+    log_file = tempfile.NamedTemporaryFile("w+", prefix="load_test_", suffix=".log", delete=False)
+    api, bot = start_processes(args, log_file)
+    failed = False
+    try:
+        wait_until_ready(f"http://127.0.0.1:{API_PORT}/stats", api)
+        wait_until_ready(f"http://127.0.0.1:{BOT_PORT}/health", bot)
+        httpx.post(f"http://127.0.0.1:{API_PORT}/reset")
+
+        transactions_before = db_transactions()
+        elapsed, latencies, errors = asyncio.run(run_load(sessions, args.concurrency))
+        transactions = db_transactions() - transactions_before
+        api_stats = httpx.get(f"http://127.0.0.1:{API_PORT}/stats").json()
+
+        summary = report(
+            elapsed, latencies, errors, transactions, peak_rss_mb(bot.pid), api_stats
+        )
+        if sum(errors.values()):
+            print(f"FAIL: {sum(errors.values())} webhook requests did not return 200")
+            failed = True
+        if args.max_p95_ms is not None and summary["p95_ms"] > args.max_p95_ms:
+            print(f"FAIL: p95 {summary['p95_ms']:.1f} ms > {args.max_p95_ms} ms")
+            failed = True
+        if args.min_rate is not None and summary["rate"] < args.min_rate:
+            print(f"FAIL: {summary['rate']:.1f} updates/s < {args.min_rate}")
+            failed = True
+    except Exception:
+        failed = True
+        raise
+    finally:
+        for process in (bot, api):
+            process.terminate()
+            process.wait(timeout=10)
+        if not args.keep_schema:
+            drop_schema()
+        if failed:
+            print(f"Server logs: {log_file.name}")
+        else:
+            os.unlink(log_file.name)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
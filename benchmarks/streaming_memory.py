@@ -0,0 +1,95 @@
+"""
+Peak RSS of reading the whole users table with fetchall() vs stream_rows().
+
+Seeds a scratch schema with synthetic users, then measures each reader
+in a fresh subprocess so peak RSS is not shared between runs. Needs the
+DB_* settings of a disposable database. Run from the repository root:
+
+    python -m benchmarks.streaming_memory --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import database
+
+SCHEMA = "bench_streaming"
+
+
+def seed(size: int) -> None:
+    conn = database.get_connection()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute(
+            f"CREATE TABLE {SCHEMA}.users ("
+            "id SERIAL PRIMARY KEY, telegram_id BIGINT UNIQUE NOT NULL, "
+            "name VARCHAR(255) NOT NULL, phone VARCHAR(20) NOT NULL, "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.users (telegram_id, name, phone) "
+            "SELECT 100000000 + n, 'Student number ' || n, '+99890' || lpad(n::text, 7, '0') "
+            "FROM generate_series(1, %s) AS n",
+            (size,),
+        )
+    conn.close()
+
+
+def read(mode: str) -> None:
+    """Runs in the child process: read every user and report rows, seconds, peak RSS."""
+    started = time.perf_counter()
+    if mode == "fetchall":
+        rows = database.get_all_users()
+        count = len(rows)
+    else:
+        count = sum(1 for _ in database.iter_all_users())
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{count} {elapsed:.3f} {peak_kb}")
+
+
+def measure(mode: str) -> tuple[int, float, float]:
+    env = dict(os.environ, PGOPTIONS=f"-c search_path={SCHEMA},public")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.streaming_memory", "--child", mode],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return int(output[0]), float(output[1]), int(output[2]) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--child", choices=["fetchall", "stream"])
+    args = parser.parse_args()
+
+    if args.child:
+        read(args.child)
+        return
+
+    print(f"{'users':>10} {'mode':<9} {'seconds':>8} {'peak RSS MB':>12}")
+    try:
+        for size in args.sizes:
+            seed(size)
+            for mode in ("fetchall", "stream"):
+                count, elapsed, peak_mb = measure(mode)
+                assert count == size
+                print(f"{size:>10,} {mode:<9} {elapsed:>8.2f} {peak_mb:>12.1f}")
+    finally:
+        conn = database.get_connection()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Memory and lookup cost of the user registry for a given number of users.
+
+Compares the sorted int64 array used by UserRegistry with a plain Python
+set of ints. No database is needed; IDs are synthetic. Run from the
+repository root:
+
+    python -m benchmarks.user_registry_memory --users 1000000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from array import array
+
+from user_registry import UserRegistry
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Telegram user IDs are currently below 2**40
+    ids = sorted(random.sample(range(1, 2**40), args.users))
+
+    def build_registry() -> UserRegistry:
+        registry = UserRegistry()
+        registry._ids = array("q", ids)
+        return registry
+
+    registry, registry_bytes = measure(build_registry)
+    # Iterating the array creates fresh int objects, so they are counted too
+    source = array("q", ids)
+    id_set, set_bytes = measure(lambda: set(source))
+
+    probes = random.choices(ids, k=args.lookups // 2) + random.sample(
+        range(2**40, 2**41), args.lookups // 2
+    )
+    for name, container in (("array", registry), ("set", id_set)):
+        started = time.perf_counter()
+        for telegram_id in probes:
+            telegram_id in container
+        elapsed = time.perf_counter() - started
+        print(f"{name:<6} {elapsed / len(probes) * 1e9:>8.0f} ns/lookup")
+
+    print(f"users            {args.users:>12,}")
+    print(f"sorted array     {registry_bytes / 2**20:>10.1f} MB")
+    print(f"python set       {set_bytes / 2**20:>10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Compare the Flask + thread-bridged webhook with the native ASGI webhook.
+
+Both servers get the same stub bot whose handler awaits a short sleep in
+place of a Bot API round trip, so the numbers reflect the serving path
+only. Run from the repository root:
+
+    python -m benchmarks.webhook_server --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from telegram.ext import MessageHandler, filters
+from werkzeug.serving import make_server
+
+import app as flask_app
+import asgi
+from webhook_filter import SECRET_HEADER, WEBHOOK_FILTER_KEY, WebhookFilter
+
+FLASK_PORT = 8101
+ASGI_PORT = 8102
+SECRET = "benchmark-secret"
+
+
+class StubApplication:
+    bot = None
+
+    def __init__(self, handler_delay: float) -> None:
+        self.handler_delay = handler_delay
+        self.handlers = {0: [MessageHandler(filters.TEXT, self.process_update)]}
+        self.bot_data = {WEBHOOK_FILTER_KEY: WebhookFilter(self, secret=SECRET)}
+
+    async def process_update(self, update) -> None:
+        await asyncio.sleep(self.handler_delay)
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1000 + update_id % 100, "type": "private"},
+            "from": {"id": 1000 + update_id % 100, "is_bot": False, "first_name": "Bench"},
+            "text": "Video title",
+        },
+    }
+
+
+def serve_flask(handler_delay: float) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=flask_app._start_event_loop, args=(loop,), daemon=True).start()
+    flask_app.telegram_app = StubApplication(handler_delay)
+    flask_app.event_loop = loop
+    make_server("127.0.0.1", FLASK_PORT, flask_app.application, threaded=True).serve_forever()
+
+
+def serve_asgi(handler_delay: float) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    asgi.telegram_app = StubApplication(handler_delay)
+    uvicorn.run(asgi.app, host="127.0.0.1", port=ASGI_PORT, lifespan="off", log_level="warning")
+
+
+def wait_until_listening(port: int) -> None:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def load(
+    url: str, requests: int, concurrency: int, first_id: int = 0
+) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+    # Fresh update_ids, or the deduplicator would drop repeats
+    counter = iter(range(first_id, first_id + requests))
+    limits = httpx.Limits(max_connections=concurrency)
+    headers = {SECRET_HEADER: SECRET}
+
+    async with httpx.AsyncClient(limits=limits, timeout=30, headers=headers) as client:
+
+        async def worker() -> None:
+            for update_id in counter:
+                started = time.perf_counter()
+                response = await client.post(url, json=make_update(update_id))
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies
+
+
+def report(name: str, elapsed: float, latencies: list[float]) -> None:
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{name:<6} {len(latencies) / elapsed:>9.1f} req/s"
+        f"   p50 {p50:>7.2f} ms   p99 {p99:>7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--handler-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    servers = (("flask", serve_flask, FLASK_PORT), ("asgi", serve_asgi, ASGI_PORT))
+    for name, target, port in servers:
+        # Each server gets its own process so it does not share a GIL with the client
+        process = multiprocessing.Process(
+            target=target, args=(args.handler_delay,), daemon=True
+        )
+        process.start()
+        try:
+            wait_until_listening(port)
+            url = f"http://127.0.0.1:{port}/webhook"
+            # Warm-up
+            asyncio.run(load(url, args.concurrency, args.concurrency, first_id=args.requests))
+            elapsed, latencies = asyncio.run(load(url, args.requests, args.concurrency))
+            report(name, elapsed, latencies)
+        finally:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
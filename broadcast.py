@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.ext import Application
+
+from async_database import (
+    claim_broadcast,
+    create_broadcast,
+    finish_broadcast,
+    get_broadcast_counts,
+    get_pending_recipients,
+    get_running_broadcasts,
+    mark_recipients,
+    release_broadcast,
+)
+from config import (
+    BROADCAST_BATCH_SIZE,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_LEASE_SECONDS,
+    BROADCAST_PROGRESS_INTERVAL,
+)
+from outbound import BULK_LANE
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_ENGINE_KEY = "broadcast_engine"
+MAX_SEND_ATTEMPTS = 3
+# Seconds between attempts to store a batch's results before giving up the run
+MARK_RETRY_DELAYS = (1, 2, 4, 8)
+
+
+class BroadcastEngine:
+    """Runs broadcasts stored in Postgres as background tasks of the application.
+
+    Every worker process runs an engine, so a broadcast is only sent by the
+    worker holding its lease in the broadcasts table. The lease is renewed
+    while sending; if the worker dies or loses the database, the lease
+    lapses and another worker's periodic sweep picks the broadcast up.
+
+    Sends go through the bulk lane of the outbound scheduler, which paces
+    them at BROADCAST_RATE and lets interactive replies overtake them.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        batch_size: int = BROADCAST_BATCH_SIZE,
+        progress_interval: float = BROADCAST_PROGRESS_INTERVAL,
+        lease_seconds: float = BROADCAST_LEASE_SECONDS,
+    ) -> None:
+        self.application = application
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._running: dict[int, asyncio.Task] = {}
+        self._sweeper: asyncio.Task | None = None
+
+    async def submit(self, admin_chat_id: int, text: str):
+        """Persist a new broadcast and start sending it in the background."""
+        broadcast_id = await create_broadcast(admin_chat_id, text)
+        if broadcast_id is not None:
+            self._start(broadcast_id, admin_chat_id, text)
+        return broadcast_id
+
+    async def resume(self) -> None:
+        """Pick up running broadcasts that no worker holds a lease on."""
+        for broadcast_id, admin_chat_id, text in await get_running_broadcasts():
+            if broadcast_id not in self._running:
+                logger.info(f"Resuming broadcast {broadcast_id}")
+                self._start(broadcast_id, admin_chat_id, text)
+
+    def start(self) -> None:
+        """Resume orphaned broadcasts now and every lease period after."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+
+    async def stop(self) -> None:
+        """Stop sending; leases are released so another worker can carry on."""
+        tasks = [task for task in (self._sweeper, *self._running.values()) if task is not None]
+        self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                await self.resume()
+            except Exception as exc:
+                logger.error(f"Failed to resume broadcasts: {exc}")
+            await asyncio.sleep(self.lease_seconds)
+
+    def _start(self, broadcast_id: int, admin_chat_id: int, text: str) -> None:
+        if broadcast_id in self._running:
+            return
+        task = self.application.create_task(
+            self._run(broadcast_id, admin_chat_id, text)
+        )
+        self._running[broadcast_id] = task
+        task.add_done_callback(lambda _: self._running.pop(broadcast_id, None))
+
+    async def _run(self, broadcast_id: int, admin_chat_id: int, text: str) -> None:
+        if not await claim_broadcast(broadcast_id, self.owner, self.lease_seconds):
+            logger.info(f"Broadcast {broadcast_id} is being sent by another worker")
+            return
+
+        lost = asyncio.Event()
+        heartbeat = asyncio.get_running_loop().create_task(
+            self._hold_lease(broadcast_id, lost)
+        )
+        try:
+            if await self._send_all(broadcast_id, admin_chat_id, text, lost):
+                return
+            logger.warning(f"Broadcast {broadcast_id} stopped early, it stays running")
+        finally:
+            heartbeat.cancel()
+            await release_broadcast(broadcast_id, self.owner)
+
+    async def _hold_lease(self, broadcast_id: int, lost: asyncio.Event) -> None:
+        """Renew the lease until cancelled; set `lost` once it can no longer be trusted."""
+        renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            claimed = await claim_broadcast(broadcast_id, self.owner, self.lease_seconds)
+            if claimed:
+                renewed = time.monotonic()
+            # A failed renewal is retried until the lease could have lapsed
+            elif claimed is False or time.monotonic() - renewed >= self.lease_seconds * 2 / 3:
+                logger.warning(f"Lost the lease on broadcast {broadcast_id}")
+                lost.set()
+                return
+
+    async def _send_all(
+        self, broadcast_id: int, admin_chat_id: int, text: str, lost: asyncio.Event
+    ) -> bool:
+        """Send to every pending recipient; False if stopped before finishing."""
+        counts = await get_broadcast_counts(broadcast_id)
+        if counts is None:
+            return False
+        total = sum(counts.values())
+        done_before = total - counts.get("pending", 0)
+        started = time.monotonic()
+        sent_now = 0
+
+        progress = await self._safe_send(
+            admin_chat_id, _progress_text(broadcast_id, done_before, total, None)
+        )
+        last_report = time.monotonic()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_telegram_id = 0
+        while True:
+            if lost.is_set():
+                return False
+            recipients = await get_pending_recipients(
+                broadcast_id, last_telegram_id, self.batch_size
+            )
+            if recipients is None:
+                return False
+            if not recipients:
+                break
+            last_telegram_id = recipients[-1]
+
+            async def deliver(chat_id: int):
+                async with semaphore:
+                    # Left pending for whoever holds the lease now
+                    if lost.is_set():
+                        return None
+                    return await self._deliver(chat_id, text)
+
+            results = await asyncio.gather(*(deliver(chat_id) for chat_id in recipients))
+            results = [result for result in results if result is not None]
+            if not await self._mark(broadcast_id, results):
+                return False
+            sent_now += len(results)
+
+            if progress is not None and time.monotonic() - last_report >= self.progress_interval:
+                rate = sent_now / max(time.monotonic() - started, 1e-6)
+                remaining = total - done_before - sent_now
+                eta = remaining / rate if rate > 0 else None
+                await self._safe_edit(
+                    progress,
+                    _progress_text(broadcast_id, done_before + sent_now, total, eta),
+                )
+                last_report = time.monotonic()
+
+        if not await finish_broadcast(broadcast_id):
+            return False
+        counts = await get_broadcast_counts(broadcast_id) or {}
+        summary = (
+            f"Broadcast #{broadcast_id} finished.\n"
+            f"Sent: {counts.get('sent', 0)}\n"
+            f"Failed: {counts.get('failed', 0)}"
+        )
+        if progress is not None:
+            await self._safe_edit(progress, summary)
+        else:
+            await self._safe_send(admin_chat_id, summary)
+        return True
+
+    async def _mark(self, broadcast_id: int, results) -> bool:
+        """Store a batch's results, retrying so a short outage does not resend it."""
+        for delay in (*MARK_RETRY_DELAYS, None):
+            if await mark_recipients(broadcast_id, results):
+                return True
+            if delay is None:
+                return False
+            await asyncio.sleep(delay)
+        return False
+
+    async def _deliver(self, chat_id: int, text: str):
+        """Send one message, returning a (telegram_id, status, error) tuple."""
+        error = None
+        for _ in range(MAX_SEND_ATTEMPTS):
+            try:
+                await self.application.bot.send_message(
+                    chat_id=chat_id, text=text, rate_limit_args=BULK_LANE
+                )
+                return chat_id, "sent", None
+            except RetryAfter as exc:
+                # The scheduler already waited and retried; try again from the top
+                error = str(exc)
+            except (Forbidden, BadRequest) as exc:
+                return chat_id, "failed", str(exc)
+            except NetworkError as exc:
+                error = str(exc)
+                await asyncio.sleep(1)
+            except TelegramError as exc:
+                return chat_id, "failed", str(exc)
+        return chat_id, "failed", error
+
+    async def _safe_send(self, chat_id: int, text: str):
+        try:
+            return await self.application.bot.send_message(chat_id=chat_id, text=text)
+        except TelegramError as exc:
+            logger.error(f"Failed to send broadcast progress: {exc}")
+            return None
+
+    async def _safe_edit(self, message, text: str) -> None:
+        try:
+            await message.edit_text(text)
+        except TelegramError as exc:
+            logger.error(f"Failed to update broadcast progress: {exc}")
+
+
+def _progress_text(broadcast_id: int, done: int, total: int, eta: float | None) -> str:
+    text = f"Broadcast #{broadcast_id}: {done}/{total} delivered."
+    if eta is not None:
+        text += f"\nETA: {int(eta // 60)}m {int(eta % 60)}s"
+    return text
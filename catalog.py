@@ -0,0 +1,94 @@
+import logging
+from dataclasses import dataclass, field
+
+from telegram import InlineKeyboardMarkup
+
+from database import VIDEO_CATALOG_CHANNEL, load_all_videos
+from keyboards.user_kb import build_videos_page_keyboard
+from notifications import notification_listener
+from video_search import VideoSearchIndex
+
+logger = logging.getLogger(__name__)
+
+
+VIDEOS_PAGE_SIZE = 8
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    videos: tuple = ()
+    links: dict = field(default_factory=dict)
+    ids: dict = field(default_factory=dict)
+    links_by_id: dict = field(default_factory=dict)
+    search_index: VideoSearchIndex = field(default_factory=lambda: VideoSearchIndex(()))
+    # Page keyboards are built on first use and live as long as the snapshot
+    _pages: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.videos) // VIDEOS_PAGE_SIZE))
+
+    def page_keyboard(self, page: int) -> InlineKeyboardMarkup | None:
+        if not self.videos:
+            return None
+        page = min(max(page, 0), self.page_count - 1)
+        keyboard = self._pages.get(page)
+        if keyboard is None:
+            start = page * VIDEOS_PAGE_SIZE
+            keyboard = build_videos_page_keyboard(
+                self.videos[start:start + VIDEOS_PAGE_SIZE], page, self.page_count
+            )
+            self._pages[page] = keyboard
+        return keyboard
+
+
+class VideoCatalog:
+    """In-memory copy of the videos table with cached inline page keyboards.
+
+    Reads never touch the database. The catalog is reloaded whenever a
+    NOTIFY arrives on VIDEO_CATALOG_CHANNEL, which create_video and
+    delete_video_by_id send in the same transaction as their write, so every
+    worker process picks up the change.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot = CatalogSnapshot()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    def get_link(self, title: str):
+        return self._snapshot.links.get(title)
+
+    def get_video_id(self, title: str):
+        return self._snapshot.ids.get(title)
+
+    def get_link_by_id(self, video_id: int):
+        return self._snapshot.links_by_id.get(video_id)
+
+    def reload(self) -> None:
+        videos = load_all_videos()
+        if videos is None:
+            # A half-read catalog would hide videos; serve the previous one
+            logger.error("Video catalog reload failed, keeping the previous snapshot")
+            return
+        self._snapshot = CatalogSnapshot(
+            videos=videos,
+            # The oldest video wins when titles repeat, like the old title lookup
+            links={title: link for _, title, link, _ in reversed(videos)},
+            ids={title: video_id for video_id, title, _, _ in reversed(videos)},
+            links_by_id={video_id: link for video_id, _, link, _ in videos},
+            search_index=VideoSearchIndex(videos),
+        )
+        logger.info(f"Video catalog loaded: {len(videos)} videos")
+
+    def start(self) -> None:
+        """Load the catalog and reload it on every change notification."""
+        self.reload()
+        notification_listener.subscribe(
+            VIDEO_CATALOG_CHANNEL, lambda _: self.reload(), resync=self.reload
+        )
+
+
+video_catalog = VideoCatalog()
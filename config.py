@@ -4,6 +4,48 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+# Point at a self-hosted Bot API server or the benchmark stand-in instead of Telegram.
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "https://api.telegram.org/bot")
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Sent by Telegram in X-Telegram-Bot-Api-Secret-Token; derived from BOT_TOKEN when unset.
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
 PORT = int(os.getenv("PORT", "8000"))
+# Telegram allows roughly 30 messages per second across all chats,
+# about one per second in a private chat and 20 per minute in a group.
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", str(20 / 60)))
+# Messages a chat may receive back to back before its rate applies.
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+# Cap on the bulk lane, leaving headroom in the global rate for interactive replies.
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "500"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "10"))
+# A worker sends a broadcast only while it holds its lease; others take over once it lapses.
+BROADCAST_LEASE_SECONDS = float(os.getenv("BROADCAST_LEASE_SECONDS", "60"))
+# Acknowledge webhooks immediately and process updates from a bounded queue.
+WEBHOOK_QUEUE_MODE = os.getenv("WEBHOOK_QUEUE_MODE", "false").lower() in ("1", "true", "yes")
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+# Seconds between batched write-backs of conversation state and user_data.
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "1"))
+# Users whose persisted state a worker trusts without re-reading it, least recently seen dropped first.
+PERSISTENCE_FRESH_USERS = int(os.getenv("PERSISTENCE_FRESH_USERS", "100000"))
+# Upper bound in seconds before admin privilege changes made outside the bot take effect.
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", "60"))
+# Seconds Telegram clients may cache inline search results.
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+# Drop Telegram redeliveries: ids remembered per process, and optionally in Postgres ("postgres").
+WEBHOOK_DEDUP_WINDOW = int(os.getenv("WEBHOOK_DEDUP_WINDOW", "10000"))
+WEBHOOK_DEDUP_STORE = os.getenv("WEBHOOK_DEDUP_STORE", "memory")
+# Event loop watchdog: lag sampling period, and the stall that counts as blocking (seconds).
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.1"))
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+# Video view analytics: events buffered in memory, flushed when a batch fills or the interval passes.
+VIEW_BUFFER_SIZE = int(os.getenv("VIEW_BUFFER_SIZE", "50000"))
+VIEW_FLUSH_BATCH = int(os.getenv("VIEW_FLUSH_BATCH", "1000"))
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))
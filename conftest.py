@@ -0,0 +1,48 @@
+import os
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+import database
+
+
+@contextmanager
+def _scratch_schema(schema: str):
+    """Create `schema`, point pooled connections at it, migrate, and drop it afterwards."""
+    try:
+        conn = database.get_connection()
+    except psycopg2.Error:
+        pytest.skip("PostgreSQL is not reachable")
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+    # Every pooled connection created from here on works inside the scratch schema
+    database.close_pool()
+    previous_options = os.environ.get("PGOPTIONS")
+    os.environ["PGOPTIONS"] = f"-c search_path={schema},public"
+    try:
+        yield database.migrate()
+    finally:
+        database.close_pool()
+        if previous_options is None:
+            os.environ.pop("PGOPTIONS", None)
+        else:
+            os.environ["PGOPTIONS"] = previous_options
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+
+@pytest.fixture()
+def users_schema():
+    """Migrated scratch schema that pooled connections use for the test."""
+    with _scratch_schema(f"test_{os.getpid()}"):
+        yield
+
+
+@pytest.fixture(scope="module")
+def migrated_schema():
+    """Scratch schema shared by a module's tests; yields the version migrate() reached."""
+    with _scratch_schema(f"test_migrations_{os.getpid()}") as version:
+        yield version
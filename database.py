@@ -1,291 +1,999 @@
+import csv
+import io
+import itertools
+import json
 import os
+import threading
+from array import array
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extras
+from psycopg2 import pool as pg_pool
+from psycopg2 import sql
+
+from migrations import LATEST_VERSION, MIGRATIONS
+from query_trace import DB_TRACE, TracingCursor
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Connections idle for longer than this are pinged before being handed out.
+DB_POOL_CHECK_INTERVAL = float(os.getenv("DB_POOL_CHECK_INTERVAL", "30"))
+
+# NOTIFY channel signalled whenever the videos table changes
+VIDEO_CATALOG_CHANNEL = "video_catalog"
+# NOTIFY channel carrying "+<telegram_id>" / "-<telegram_id>" on registration changes
+USER_REGISTRY_CHANNEL = "user_registry"
+# Payload on USER_REGISTRY_CHANNEL asking for a full reload after a bulk change
+USER_REGISTRY_RELOAD = "*"
+# NOTIFY channel signalled whenever the admins table changes
+ADMINS_CHANNEL = "admins"
+# NOTIFY channel carrying a JSON [origin, kind, key] per written bot_persistence row
+PERSISTENCE_CHANNEL = "persistence"
+
+# Rows fetched per round trip by the streaming iter_* helpers
+DB_ITERSIZE = int(os.getenv("DB_ITERSIZE", "2000"))
+
+# Arbitrary key for pg_advisory_lock so only one process migrates at a time
+MIGRATION_LOCK_ID = 724_001
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = None
+_last_used: dict[int, float] = {}
+_cursor_ids = itertools.count()
+
+
+def _connection_kwargs() -> dict:
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "dbname": os.getenv("DB_NAME", ""),
+        "user": os.getenv("DB_USER", ""),
+        "password": os.getenv("DB_PASSWORD", ""),
+        **({"cursor_factory": TracingCursor} if DB_TRACE else {}),
+    }
 
 
 def get_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432"),
-        dbname=os.getenv("DB_NAME", ""),
-        user=os.getenv("DB_USER", ""),
-        password=os.getenv("DB_PASSWORD", ""),
-    )
+    """Open a standalone connection that does not belong to the pool."""
+    return psycopg2.connect(**_connection_kwargs())
+
+
+def get_pool() -> pg_pool.ThreadedConnectionPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+                _pool = pg_pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, **_connection_kwargs()
+                )
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = None
+        _pool_slots = None
+        _last_used.clear()
+
+
+def _is_healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    idle_for = time.monotonic() - _last_used.get(id(conn), 0.0)
+    if idle_for < DB_POOL_CHECK_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
 
 
-def get_user_by_telegram_id(telegram_id: int):
+def _checkout(db_pool):
+    while True:
+        conn = db_pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        _last_used.pop(id(conn), None)
+        db_pool.putconn(conn, close=True)
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; it is returned (or discarded if broken) on exit."""
+    db_pool = get_pool()
+    slots = _pool_slots
+    slots.acquire()
     conn = None
-    cur = None
+    broken = False
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, telegram_id, name, phone, created_at FROM users WHERE telegram_id = %s",
-            (telegram_id,),
-        )
-        return cur.fetchone()
+        conn = _checkout(db_pool)
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        if conn is not None and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        if conn is not None:
+            broken = broken or conn.closed != 0
+            if broken:
+                _last_used.pop(id(conn), None)
+            else:
+                _last_used[id(conn)] = time.monotonic()
+            db_pool.putconn(conn, close=broken)
+        slots.release()
+
+
+@contextmanager
+def get_cursor(commit: bool = False):
+    """Yield a cursor on a pooled connection, committing on success if asked."""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            yield cur
+        if commit:
+            conn.commit()
+        else:
+            conn.rollback()
+
+
+def stream_rows(query: str, params=None, itersize: int = DB_ITERSIZE):
+    """Yield rows through a named server-side cursor, `itersize` rows per round trip.
+
+    The pooled connection stays checked out until the generator is exhausted
+    or closed, so consume it promptly.
+    """
+    with connection() as conn:
+        with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            yield from cur
+        conn.rollback()
+
+
+def get_user_by_telegram_id(telegram_id: int):
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, telegram_id, name, phone, created_at FROM users WHERE telegram_id = %s",
+                (telegram_id,),
+            )
+            return cur.fetchone()
     except Exception as exc:
         print(f"Database error while fetching user: {exc}")
         return None
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
 
 
-def create_user(telegram_id: int, name: str, phone: str) -> None:
-    conn = None
-    cur = None
+def create_user(telegram_id: int, name: str, phone: str) -> bool:
+    """Register a user, or update the details of one already registered."""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO users (telegram_id, name, phone) VALUES (%s, %s, %s)",
-            (telegram_id, name, phone),
-        )
-        conn.commit()
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO users (telegram_id, name, phone) VALUES (%s, %s, %s) "
+                "ON CONFLICT (telegram_id) DO UPDATE "
+                "SET name = EXCLUDED.name, phone = EXCLUDED.phone",
+                (telegram_id, name, phone),
+            )
+            cur.execute(
+                "SELECT pg_notify(%s, %s)", (USER_REGISTRY_CHANNEL, f"+{telegram_id}")
+            )
+        return True
     except Exception as exc:
         print(f"Database error while creating user: {exc}")
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
+        return False
 
 
 def create_video(title: str, youtube_link: str) -> None:
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO videos (title, youtube_link) VALUES (%s, %s)",
-            (title, youtube_link),
-        )
-        conn.commit()
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO videos (title, youtube_link) VALUES (%s, %s)",
+                (title, youtube_link),
+            )
+            cur.execute(f"NOTIFY {VIDEO_CATALOG_CHANNEL}")
     except Exception as exc:
         print(f"Database error while creating video: {exc}")
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
 
 
 def get_all_videos():
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, title, youtube_link, created_at FROM videos ORDER BY id")
-        return cur.fetchall()
+        with get_cursor() as cur:
+            cur.execute("SELECT id, title, youtube_link, created_at FROM videos ORDER BY id")
+            return cur.fetchall()
     except Exception as exc:
         print(f"Database error while fetching videos: {exc}")
         return []
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
 
 
-def get_video_by_title(title: str):
-    conn = None
-    cur = None
+def iter_all_videos(itersize: int = DB_ITERSIZE):
+    try:
+        yield from stream_rows(
+            "SELECT id, title, youtube_link, created_at FROM videos ORDER BY id",
+            itersize=itersize,
+        )
+    except Exception as exc:
+        print(f"Database error while streaming videos: {exc}")
+
+
+def load_all_videos():
+    """Return every video as a tuple, or None if the read failed part way."""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, title, youtube_link, created_at FROM videos WHERE title = %s",
-            (title,),
+        return tuple(
+            stream_rows("SELECT id, title, youtube_link, created_at FROM videos ORDER BY id")
         )
-        return cur.fetchone()
+    except Exception as exc:
+        print(f"Database error while loading videos: {exc}")
+        return None
+
+
+def get_video_by_title(title: str):
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, title, youtube_link, created_at FROM videos WHERE title = %s",
+                (title,),
+            )
+            return cur.fetchone()
     except Exception as exc:
         print(f"Database error while fetching video: {exc}")
         return None
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
+
+
+def get_user_telegram_ids() -> array | None:
+    """Return every registered telegram_id as a sorted int64 array.
+
+    Returns None if the read fails, even part way, rather than a partial array.
+    """
+    ids = array("q")
+    try:
+        rows = stream_rows("SELECT telegram_id FROM users ORDER BY telegram_id", itersize=10000)
+        ids.extend(row[0] for row in rows)
+    except Exception as exc:
+        print(f"Database error while fetching user ids: {exc}")
+        return None
+    return ids
+
+
+def search_videos(query: str, limit: int):
+    """Fuzzy title search using the pg_trgm word-similarity index."""
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, title, youtube_link, created_at FROM videos "
+                "WHERE %s <%% title ORDER BY word_similarity(%s, title) DESC, id LIMIT %s",
+                (query, query, limit),
+            )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while searching videos: {exc}")
+        return []
 
 
 def get_all_users():
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, name, phone, telegram_id FROM users ORDER BY id"
-        )
-        return cur.fetchall()
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, name, phone, telegram_id FROM users ORDER BY id"
+            )
+            return cur.fetchall()
     except Exception as exc:
         print(f"Database error while fetching users: {exc}")
         return []
+
+
+def _like_pattern(search: str) -> str:
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def iter_all_users(itersize: int = DB_ITERSIZE):
+    try:
+        yield from stream_rows(
+            "SELECT id, name, phone, telegram_id FROM users ORDER BY id",
+            itersize=itersize,
+        )
+    except Exception as exc:
+        print(f"Database error while streaming users: {exc}")
+
+
+def export_users_csv(fileobj):
+    """COPY every user as CSV into a binary file object; returns the row count.
+
+    COPY TO only takes the lock a plain SELECT takes, so registrations and
+    deletes carry on while it runs.
+    """
+    try:
+        with get_cursor() as cur:
+            cur.copy_expert(
+                "COPY users (telegram_id, name, phone, created_at) "
+                "TO STDOUT WITH (FORMAT csv, HEADER true)",
+                fileobj,
+            )
+            return cur.rowcount
+    except Exception as exc:
+        print(f"Database error while exporting users: {exc}")
+        return None
+
+
+# Columns an import file must have; any other columns are ignored
+IMPORT_COLUMNS = ("telegram_id", "name", "phone")
+# Rejected row numbers listed in the import summary
+IMPORT_REJECTED_SAMPLE = 5
+
+
+class _ImportRows:
+    """Read-only file for COPY holding the CSV rows that have the header's width.
+
+    Each row is prefixed with its row number. Rows with a different number
+    of fields would abort the whole COPY, so they are counted here instead
+    and their numbers kept for the summary; blank lines are skipped.
+    """
+
+    def __init__(self, reader, width: int) -> None:
+        self._reader = reader
+        self._width = width
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self.row = 0
+        self.malformed = 0
+        self.malformed_rows: list[int] = []
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or self._buffer.tell() < size:
+            fields = next(self._reader, None)
+            if fields is None:
+                break
+            self.row += 1
+            if not fields:
+                continue
+            if len(fields) != self._width:
+                self.malformed += 1
+                if len(self.malformed_rows) < IMPORT_REJECTED_SAMPLE:
+                    self.malformed_rows.append(self.row)
+                continue
+            self._writer.writerow((self.row, *fields))
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def import_users_csv(fileobj):
+    """Upsert users from a CSV file object with a header row, in one transaction.
+
+    The rows are COPYed into a temporary staging table and merged into users
+    with a single INSERT ... ON CONFLICT (telegram_id). Rows with the wrong
+    number of fields, a malformed id, a blank or too long name or phone, or
+    an id repeated further down the file are rejected. Returns a dict of
+    counts plus the first rejected row numbers, or None if the file could
+    not be loaded.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        columns = [column.strip().lower() for column in next(reader, [])]
+        if any(columns.count(column) != 1 for column in IMPORT_COLUMNS):
+            raise ValueError(f"header must name {', '.join(IMPORT_COLUMNS)} once each")
+        # Staged by position, so no header name can clash with the line column
+        staged = [sql.Identifier(f"col_{index}") for index in range(len(columns))]
+        source = {column: staged[columns.index(column)] for column in IMPORT_COLUMNS}
+        rows = _ImportRows(reader, len(columns))
+
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                sql.SQL(
+                    "CREATE TEMP TABLE users_import (line BIGINT, {}) ON COMMIT DROP"
+                ).format(
+                    sql.SQL(", ").join(sql.SQL("{} TEXT").format(column) for column in staged)
+                )
+            )
+            cur.copy_expert(
+                sql.SQL("COPY users_import (line, {}) FROM STDIN WITH (FORMAT csv)")
+                .format(sql.SQL(", ").join(staged))
+                .as_string(cur),
+                rows,
+            )
+            cur.execute(
+                sql.SQL(
+                    """
+                    WITH staged AS (
+                        SELECT
+                            line,
+                            CASE WHEN trim({telegram_id}) ~ '^[0-9]{{1,18}}$'
+                                THEN trim({telegram_id})::bigint END AS telegram_id,
+                            trim({name}) AS name,
+                            trim({phone}) AS phone
+                        FROM users_import
+                    ), valid AS (
+                        SELECT DISTINCT ON (telegram_id) line, telegram_id, name, phone
+                        FROM staged
+                        WHERE telegram_id IS NOT NULL
+                            AND name <> '' AND length(name) <= 255
+                            AND phone <> '' AND length(phone) <= 20
+                        ORDER BY telegram_id, line DESC
+                    ), upserted AS (
+                        INSERT INTO users (telegram_id, name, phone)
+                        SELECT telegram_id, name, phone FROM valid
+                        ON CONFLICT (telegram_id) DO UPDATE
+                            SET name = EXCLUDED.name, phone = EXCLUDED.phone
+                            WHERE (users.name, users.phone)
+                                IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.phone)
+                        RETURNING xmax = 0 AS inserted
+                    )
+                    SELECT
+                        (SELECT count(*) FROM staged),
+                        (SELECT count(*) FROM valid),
+                        (SELECT count(*) FROM upserted WHERE inserted),
+                        (SELECT count(*) FROM upserted WHERE NOT inserted),
+                        ARRAY(
+                            SELECT s.line FROM staged s
+                            WHERE NOT EXISTS (SELECT 1 FROM valid v WHERE v.line = s.line)
+                            ORDER BY s.line
+                            LIMIT %s
+                        )
+                    """
+                ).format(**source),
+                (IMPORT_REJECTED_SAMPLE,),
+            )
+            total, valid, inserted, updated, rejected_rows = cur.fetchone()
+            if inserted:
+                # One reload instead of a notification per new user
+                cur.execute(
+                    "SELECT pg_notify(%s, %s)", (USER_REGISTRY_CHANNEL, USER_REGISTRY_RELOAD)
+                )
+        return {
+            "inserted": inserted,
+            "updated": updated,
+            "unchanged": valid - inserted - updated,
+            "rejected": total + rows.malformed - valid,
+            "rejected_rows": sorted(rejected_rows + rows.malformed_rows)[:IMPORT_REJECTED_SAMPLE],
+        }
+    except Exception as exc:
+        print(f"Database error while importing users: {exc}")
+        return None
     finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
+        # Leave closing the upload to the caller
+        text.detach()
+
+
+def get_users_page(after_id: int, limit: int, search: str | None = None):
+    """Return up to `limit` users with id > after_id, oldest first."""
+    try:
+        with get_cursor() as cur:
+            if search:
+                pattern = _like_pattern(search)
+                cur.execute(
+                    "SELECT id, name, phone, telegram_id FROM users "
+                    "WHERE id > %s AND (name ILIKE %s OR phone LIKE %s) "
+                    "ORDER BY id LIMIT %s",
+                    (after_id, pattern, pattern, limit),
+                )
+            else:
+                cur.execute(
+                    "SELECT id, name, phone, telegram_id FROM users "
+                    "WHERE id > %s ORDER BY id LIMIT %s",
+                    (after_id, limit),
+                )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while fetching users page: {exc}")
+        return []
+
+
+def get_users_page_before(before_id: int, limit: int, search: str | None = None):
+    """Return up to `limit` users with id < before_id, newest first."""
+    try:
+        with get_cursor() as cur:
+            if search:
+                pattern = _like_pattern(search)
+                cur.execute(
+                    "SELECT id, name, phone, telegram_id FROM users "
+                    "WHERE id < %s AND (name ILIKE %s OR phone LIKE %s) "
+                    "ORDER BY id DESC LIMIT %s",
+                    (before_id, pattern, pattern, limit),
+                )
+            else:
+                cur.execute(
+                    "SELECT id, name, phone, telegram_id FROM users "
+                    "WHERE id < %s ORDER BY id DESC LIMIT %s",
+                    (before_id, limit),
+                )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while fetching users page: {exc}")
+        return []
 
 
 def delete_user_by_telegram_id(telegram_id: int) -> None:
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM users WHERE telegram_id = %s", (telegram_id,))
-        conn.commit()
+        with get_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM users WHERE telegram_id = %s", (telegram_id,))
+            cur.execute(
+                "SELECT pg_notify(%s, %s)", (USER_REGISTRY_CHANNEL, f"-{telegram_id}")
+            )
     except Exception as exc:
         print(f"Database error while deleting user: {exc}")
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
+
+
+def delete_users_by_telegram_ids(telegram_ids) -> int | None:
+    """Delete many users in one statement; returns how many were deleted."""
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "WITH deleted AS ("
+                "DELETE FROM users WHERE telegram_id = ANY(%s::bigint[]) RETURNING telegram_id"
+                ") SELECT count(pg_notify(%s, '-' || telegram_id)) FROM deleted",
+                (list(telegram_ids), USER_REGISTRY_CHANNEL),
+            )
+            return cur.fetchone()[0]
+    except Exception as exc:
+        print(f"Database error while deleting users: {exc}")
+        return None
 
 
 def get_all_videos_with_id():
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, title, youtube_link FROM videos ORDER BY id")
-        return cur.fetchall()
+        with get_cursor() as cur:
+            cur.execute("SELECT id, title, youtube_link FROM videos ORDER BY id")
+            return cur.fetchall()
     except Exception as exc:
         print(f"Database error while fetching videos: {exc}")
         return []
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
+
+
+def iter_all_videos_with_id(itersize: int = DB_ITERSIZE):
+    try:
+        yield from stream_rows(
+            "SELECT id, title, youtube_link FROM videos ORDER BY id",
+            itersize=itersize,
+        )
+    except Exception as exc:
+        print(f"Database error while streaming videos: {exc}")
+
+
+def get_videos_page(after_id: int, limit: int):
+    """Return up to `limit` videos with id > after_id, oldest first."""
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, title FROM videos WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, limit),
+            )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while fetching videos page: {exc}")
+        return []
+
+
+def get_videos_page_before(before_id: int, limit: int):
+    """Return up to `limit` videos with id < before_id, newest first."""
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, title FROM videos WHERE id < %s ORDER BY id DESC LIMIT %s",
+                (before_id, limit),
+            )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while fetching videos page: {exc}")
+        return []
 
 
 def delete_video_by_id(video_id: int) -> None:
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM videos WHERE id = %s", (video_id,))
-        conn.commit()
+        with get_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM videos WHERE id = %s", (video_id,))
+            cur.execute(f"NOTIFY {VIDEO_CATALOG_CHANNEL}")
     except Exception as exc:
         print(f"Database error while deleting video: {exc}")
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
-
-
-def create_tables() -> None:
-    create_users_table = """
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        telegram_id BIGINT UNIQUE NOT NULL,
-        name VARCHAR(255) NOT NULL,
-        phone VARCHAR(20) NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
 
-    create_videos_table = """
-    CREATE TABLE IF NOT EXISTS videos (
-        id SERIAL PRIMARY KEY,
-        title VARCHAR(255) NOT NULL,
-        youtube_link TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
 
-    create_admins_table = """
-    CREATE TABLE IF NOT EXISTS admins (
-        id SERIAL PRIMARY KEY,
-        telegram_id BIGINT UNIQUE NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
+def delete_videos_by_ids(video_ids) -> int | None:
+    """Delete many videos in one statement; returns how many were deleted."""
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM videos WHERE id = ANY(%s::int[])", (list(video_ids),))
+            deleted = cur.rowcount
+            if deleted:
+                cur.execute(f"NOTIFY {VIDEO_CATALOG_CHANNEL}")
+            return deleted
+    except Exception as exc:
+        print(f"Database error while deleting videos: {exc}")
+        return None
 
-    conn = None
-    cur = None
+
+def get_schema_version() -> int:
+    """Return the highest applied migration, or 0 on a database without migrations."""
+    with get_cursor() as cur:
+        # Migrations create their tables in current_schema(); look only there
+        cur.execute("SELECT to_regclass(format('%I.schema_version', current_schema()))")
+        if cur.fetchone()[0] is None:
+            return 0
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cur.fetchone()[0]
+
+
+def migrate() -> int:
+    """Apply pending migrations and return the resulting schema version.
+
+    Startup costs one query when the schema is current. Workers racing to
+    migrate are serialized by an advisory lock. A failing migration is
+    rolled back and stops the run; later ones are retried on next start.
+    """
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(create_users_table)
-        cur.execute(create_videos_table)
-        cur.execute(create_admins_table)
-        conn.commit()
+        version = get_schema_version()
+        if version >= LATEST_VERSION:
+            return version
+
+        with connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+                try:
+                    cur.execute(
+                        "CREATE TABLE IF NOT EXISTS schema_version ("
+                        "version INTEGER PRIMARY KEY, "
+                        "description TEXT NOT NULL, "
+                        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+                    )
+                    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                    version = cur.fetchone()[0]
+                    conn.commit()
+
+                    for number, description, statements in MIGRATIONS:
+                        if number <= version:
+                            continue
+                        try:
+                            for statement in statements:
+                                cur.execute(statement)
+                            cur.execute(
+                                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                                (number, description),
+                            )
+                            conn.commit()
+                        except psycopg2.Error as exc:
+                            conn.rollback()
+                            print(f"Database error while applying migration {number}: {exc}")
+                            break
+                        version = number
+                        print(f"Applied migration {number}: {description}")
+                finally:
+                    conn.rollback()
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                    conn.commit()
+        return version
     except Exception as exc:
-        print(f"Database error while creating tables: {exc}")
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
+        print(f"Database error while migrating: {exc}")
+        return 0
 
 
 def add_admin(telegram_id: int) -> None:
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO admins (telegram_id) VALUES (%s) ON CONFLICT (telegram_id) DO NOTHING",
-            (telegram_id,),
-        )
-        conn.commit()
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO admins (telegram_id) VALUES (%s) ON CONFLICT (telegram_id) DO NOTHING",
+                (telegram_id,),
+            )
+            cur.execute(f"NOTIFY {ADMINS_CHANNEL}")
     except Exception as exc:
         print(f"Database error while adding admin: {exc}")
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
 
 
 def is_admin(telegram_id: int) -> bool:
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM admins WHERE telegram_id = %s", (telegram_id,))
-        result = cur.fetchone()
-        return result is not None
+        with get_cursor() as cur:
+            cur.execute("SELECT id FROM admins WHERE telegram_id = %s", (telegram_id,))
+            result = cur.fetchone()
+            return result is not None
     except Exception as exc:
         print(f"Database error while checking admin: {exc}")
         return False
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
 
 
 def get_all_admins():
-    conn = None
-    cur = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, telegram_id, created_at FROM admins ORDER BY id")
-        return cur.fetchall()
+        with get_cursor() as cur:
+            cur.execute("SELECT id, telegram_id, created_at FROM admins ORDER BY id")
+            return cur.fetchall()
     except Exception as exc:
         print(f"Database error while fetching admins: {exc}")
+        return None
+
+
+def create_broadcast(admin_chat_id: int, text: str):
+    """Create a broadcast with one pending recipient row per registered user."""
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO broadcasts (admin_chat_id, text) VALUES (%s, %s) RETURNING id",
+                (admin_chat_id, text),
+            )
+            broadcast_id = cur.fetchone()[0]
+            cur.execute(
+                "INSERT INTO broadcast_recipients (broadcast_id, telegram_id) "
+                "SELECT %s, telegram_id FROM users",
+                (broadcast_id,),
+            )
+            return broadcast_id
+    except Exception as exc:
+        print(f"Database error while creating broadcast: {exc}")
+        return None
+
+
+def get_running_broadcasts():
+    """Return running broadcasts whose lease is free or has lapsed."""
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT id, admin_chat_id, text FROM broadcasts "
+                "WHERE status = 'running' "
+                "AND (lease_expires_at IS NULL OR lease_expires_at < CURRENT_TIMESTAMP) "
+                "ORDER BY id"
+            )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while fetching broadcasts: {exc}")
+        return []
+
+
+def claim_broadcast(broadcast_id: int, owner: str, lease_seconds: float):
+    """Take or renew the lease on a running broadcast.
+
+    Returns True if `owner` now holds it, False if another worker does or
+    the broadcast is no longer running, None on a database error.
+    """
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "UPDATE broadcasts SET lease_owner = %s, "
+                "lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => %s) "
+                "WHERE id = %s AND status = 'running' AND (lease_owner = %s "
+                "OR lease_expires_at IS NULL OR lease_expires_at < CURRENT_TIMESTAMP) "
+                "RETURNING id",
+                (owner, lease_seconds, broadcast_id, owner),
+            )
+            return cur.fetchone() is not None
+    except Exception as exc:
+        print(f"Database error while claiming broadcast: {exc}")
+        return None
+
+
+def release_broadcast(broadcast_id: int, owner: str) -> None:
+    """Give up a lease early so another worker can resume the broadcast."""
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "UPDATE broadcasts SET lease_owner = NULL, lease_expires_at = NULL "
+                "WHERE id = %s AND lease_owner = %s",
+                (broadcast_id, owner),
+            )
+    except Exception as exc:
+        print(f"Database error while releasing broadcast: {exc}")
+
+
+def get_pending_recipients(broadcast_id: int, after_telegram_id: int, limit: int):
+    """Return the next pending recipient ids, or None on a database error."""
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT telegram_id FROM broadcast_recipients "
+                "WHERE broadcast_id = %s AND status = 'pending' AND telegram_id > %s "
+                "ORDER BY telegram_id LIMIT %s",
+                (broadcast_id, after_telegram_id, limit),
+            )
+            return [row[0] for row in cur.fetchall()]
+    except Exception as exc:
+        print(f"Database error while fetching broadcast recipients: {exc}")
+        return None
+
+
+def mark_recipients(broadcast_id: int, results) -> bool:
+    """Store delivery results given as (telegram_id, status, error) tuples."""
+    if not results:
+        return True
+    try:
+        with get_cursor(commit=True) as cur:
+            extras.execute_values(
+                cur,
+                "UPDATE broadcast_recipients AS r "
+                "SET status = v.status, error = v.error, updated_at = CURRENT_TIMESTAMP "
+                "FROM (VALUES %s) AS v (broadcast_id, telegram_id, status, error) "
+                "WHERE r.broadcast_id = v.broadcast_id AND r.telegram_id = v.telegram_id",
+                [
+                    (broadcast_id, telegram_id, status, error)
+                    for telegram_id, status, error in results
+                ],
+                template="(%s::integer, %s::bigint, %s, %s)",
+            )
+        return True
+    except Exception as exc:
+        print(f"Database error while updating broadcast recipients: {exc}")
+        return False
+
+
+def get_broadcast_counts(broadcast_id: int):
+    """Return a {status: count} mapping for one broadcast, or None on a database error."""
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT status, COUNT(*) FROM broadcast_recipients "
+                "WHERE broadcast_id = %s GROUP BY status",
+                (broadcast_id,),
+            )
+            return dict(cur.fetchall())
+    except Exception as exc:
+        print(f"Database error while counting broadcast recipients: {exc}")
+        return None
+
+
+def finish_broadcast(broadcast_id: int) -> bool:
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "UPDATE broadcasts SET status = 'finished', finished_at = CURRENT_TIMESTAMP, "
+                "lease_owner = NULL, lease_expires_at = NULL "
+                "WHERE id = %s",
+                (broadcast_id,),
+            )
+        return True
+    except Exception as exc:
+        print(f"Database error while finishing broadcast: {exc}")
+        return False
+
+
+def load_persistence_rows(keys):
+    """Fetch (kind, key, data, version) rows for the given (kind, key) pairs.
+
+    Returns None on a database error, so callers can keep what they have.
+    """
+    if not keys:
+        return []
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT kind, key, data, version FROM bot_persistence "
+                "WHERE (kind, key) IN %s",
+                (tuple(keys),),
+            )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while loading persistence: {exc}")
+        return None
+
+
+def save_persistence_rows(rows, origin: str = ""):
+    """Upsert (kind, key, data) rows in one transaction; data None deletes the row.
+
+    Every written row is announced on PERSISTENCE_CHANNEL, tagged with
+    `origin` so the writer can ignore its own notifications. Returns
+    (kind, key, version) for every row that was upserted, or None on error.
+    """
+    upserts = [(kind, key, extras.Json(data)) for kind, key, data in rows if data is not None]
+    deletes = [(kind, key) for kind, key, data in rows if data is None]
+    try:
+        with get_cursor(commit=True) as cur:
+            written = []
+            if upserts:
+                written = extras.execute_values(
+                    cur,
+                    "INSERT INTO bot_persistence (kind, key, data) VALUES %s "
+                    "ON CONFLICT (kind, key) DO UPDATE SET data = EXCLUDED.data, "
+                    "version = bot_persistence.version + 1, updated_at = CURRENT_TIMESTAMP "
+                    "RETURNING kind, key, version",
+                    upserts,
+                    fetch=True,
+                )
+            if deletes:
+                cur.execute(
+                    "DELETE FROM bot_persistence WHERE (kind, key) IN %s",
+                    (tuple(deletes),),
+                )
+            cur.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                (
+                    PERSISTENCE_CHANNEL,
+                    [json.dumps([origin, kind, key]) for kind, key, _ in rows],
+                ),
+            )
+            return written
+    except Exception as exc:
+        print(f"Database error while saving persistence: {exc}")
+        return None
+
+
+def mark_update_processed(update_id: int) -> bool:
+    """Claim an update_id; False if another worker already claimed it."""
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO processed_updates (update_id) VALUES (%s) "
+                "ON CONFLICT (update_id) DO NOTHING RETURNING update_id",
+                (update_id,),
+            )
+            claimed = cur.fetchone() is not None
+            # Telegram stops redelivering after a day; prune roughly once per 1000 claims
+            if claimed and update_id % 1000 == 0:
+                cur.execute(
+                    "DELETE FROM processed_updates "
+                    "WHERE received_at < CURRENT_TIMESTAMP - INTERVAL '1 day'"
+                )
+            return claimed
+    except Exception as exc:
+        print(f"Database error while marking update processed: {exc}")
+        # Fail open: processing twice is better than dropping the update
+        return True
+
+
+def delete_processed_update(update_id: int) -> None:
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM processed_updates WHERE update_id = %s", (update_id,))
+    except Exception as exc:
+        print(f"Database error while deleting processed update: {exc}")
+
+
+def record_video_views(views) -> bool:
+    """Store (video_id, telegram_id, viewed_at) events and fold them into daily rollups."""
+    daily: dict[tuple, int] = {}
+    rows = io.StringIO()
+    for video_id, telegram_id, viewed_at in views:
+        rows.write(f"{video_id}\t{telegram_id}\t{viewed_at.isoformat()}\n")
+        key = (viewed_at.date(), video_id)
+        daily[key] = daily.get(key, 0) + 1
+    rows.seek(0)
+    try:
+        with get_cursor(commit=True) as cur:
+            cur.copy_expert(
+                "COPY video_views (video_id, telegram_id, viewed_at) FROM STDIN", rows
+            )
+            extras.execute_values(
+                cur,
+                "INSERT INTO video_view_daily (day, video_id, views) VALUES %s "
+                "ON CONFLICT (day, video_id) DO UPDATE "
+                "SET views = video_view_daily.views + EXCLUDED.views",
+                [(day, video_id, count) for (day, video_id), count in daily.items()],
+            )
+        return True
+    except Exception as exc:
+        print(f"Database error while recording video views: {exc}")
+        return False
+
+
+def get_top_videos(days: int, limit: int):
+    try:
+        with get_cursor() as cur:
+            cur.execute(
+                "SELECT v.title, SUM(d.views)::bigint AS views "
+                "FROM video_view_daily d JOIN videos v ON v.id = d.video_id "
+                "WHERE d.day > (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')::date - %s "
+                "GROUP BY v.id, v.title ORDER BY views DESC, v.id LIMIT %s",
+                (days, limit),
+            )
+            return cur.fetchall()
+    except Exception as exc:
+        print(f"Database error while fetching top videos: {exc}")
         return []
-    finally:
-        if cur is not None:
-            cur.close()
-        if conn is not None:
-            conn.close()
 
 
 def init_db() -> None:
-    create_tables()
+    """Migrate the schema; refuses to start the bot on a partly migrated one."""
+    version = migrate()
+    if version < LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {LATEST_VERSION}; "
+            "see the migration errors above"
+        )
@@ -0,0 +1,53 @@
+import threading
+from collections import deque
+
+from config import WEBHOOK_DEDUP_STORE, WEBHOOK_DEDUP_WINDOW
+from database import delete_processed_update, mark_update_processed
+
+
+class UpdateDeduplicator:
+    """Remembers recent update_ids so Telegram redeliveries are dropped.
+
+    The in-memory window keeps the last `window` ids of this process. With
+    the postgres store, ids that are new locally are also claimed in the
+    processed_updates table so a redelivery to another worker is dropped
+    too. Ids are claimed before processing and released whenever the
+    webhook answers with a non-2xx status, so Telegram's redelivery of a
+    failed update runs again, possibly after the first attempt did part of
+    its work.
+    """
+
+    def __init__(self, window: int = WEBHOOK_DEDUP_WINDOW, store: str = WEBHOOK_DEDUP_STORE) -> None:
+        self.window = window
+        self.shared = store == "postgres"
+        self._order: deque[int] = deque()
+        self._ids: set[int] = set()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def claim(self, update_id: int) -> bool:
+        """Return True if this update_id is new and now claimed, False for a repeat."""
+        with self._lock:
+            if update_id in self._ids:
+                self.duplicates += 1
+                return False
+            self._ids.add(update_id)
+            self._order.append(update_id)
+            if len(self._order) > self.window:
+                self._ids.discard(self._order.popleft())
+
+        if self.shared and not mark_update_processed(update_id):
+            with self._lock:
+                self.duplicates += 1
+            return False
+        return True
+
+    def release(self, update_id: int) -> None:
+        """Forget a claim, e.g. when the update was refused with 503 and will be resent."""
+        with self._lock:
+            self._ids.discard(update_id)
+        if self.shared:
+            delete_processed_update(update_id)
+
+
+update_deduplicator = UpdateDeduplicator()
@@ -1,4 +1,6 @@
-import asyncio
+import gzip
+import tempfile
+from datetime import date
 
 from telegram import (
     InlineKeyboardButton,
@@ -9,34 +11,60 @@ from telegram import (
 )
 from telegram.ext import (
     CallbackQueryHandler,
+    CommandHandler,
     ConversationHandler,
     ContextTypes,
     MessageHandler,
     filters,
 )
 
-from database import (
+from async_database import (
     create_video,
     delete_user_by_telegram_id,
+    delete_users_by_telegram_ids,
     delete_video_by_id,
-    get_all_users,
+    delete_videos_by_ids,
+    export_users_csv,
     get_all_videos_with_id,
-    is_admin,
+    get_top_videos,
+    get_users_page,
+    get_users_page_before,
+    get_videos_page,
+    get_videos_page_before,
+    import_users_csv,
+)
+from admin_cache import admin_cache
+from broadcast import BROADCAST_ENGINE_KEY
+from keyboards.admin_kb import (
+    build_delete_confirm_keyboard,
+    build_users_page_keyboard,
+    build_videos_page_keyboard,
+    build_videos_select_keyboard,
 )
 
 ADD_TITLE, ADD_LINK = range(2)
+USERS_PAGE_SIZE = 10
+VIDEOS_PAGE_SIZE = 10
+TOP_VIDEOS_DAYS = 7
+TOP_VIDEOS_LIMIT = 10
+# Fast enough to keep up with COPY; level 9 costs far more CPU for a few percent
+EXPORT_COMPRESSLEVEL = 6
+# The Bot API refuses uploaded documents larger than this
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+# Bots cannot download files larger than this through the Bot API
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
 
 
 async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if update.effective_user is None or update.message is None:
         return
 
-    if not is_admin(update.effective_user.id):
+    if not admin_cache.is_admin(update.effective_user.id):
         await update.message.reply_text("Access denied.")
         return
 
     reply_markup = ReplyKeyboardMarkup(
-        [["Add Video", "View Users"], ["Manage Videos"]],
+        [["Add Video", "View Users"], ["Manage Videos", "Top Videos"], ["Export Users"]],
         resize_keyboard=True,
         one_time_keyboard=True,
     )
@@ -48,7 +76,7 @@ async def add_video_start(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if update.effective_user is None or update.message is None:
         return ConversationHandler.END
 
-    if not is_admin(update.effective_user.id):
+    if not admin_cache.is_admin(update.effective_user.id):
         await update.message.reply_text("Access denied.")
         return ConversationHandler.END
 
@@ -78,7 +106,7 @@ async def add_video_link(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text("Enter video title:")
         return ADD_TITLE
 
-    create_video(title, youtube_link)
+    await create_video(title, youtube_link)
     context.user_data.pop("video_title", None)
 
     await update.message.reply_text(
@@ -86,20 +114,10 @@ async def add_video_link(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         reply_markup=ReplyKeyboardRemove(),
     )
 
-    # Broadcast new video
-    users = get_all_users()
+    # Broadcast new video in the background
     broadcast_message = f"New video just released!\n{youtube_link}"
-
-    for user in users:
-        user_telegram_id = user[3]
-        try:
-            await context.bot.send_message(
-                chat_id=user_telegram_id,
-                text=broadcast_message,
-            )
-        except Exception:
-            pass
-        await asyncio.sleep(0.05)
+    engine = context.bot_data[BROADCAST_ENGINE_KEY]
+    await engine.submit(update.effective_chat.id, broadcast_message)
 
     return ConversationHandler.END
 
@@ -108,33 +126,149 @@ async def view_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     if update.effective_user is None or update.message is None:
         return
 
-    if not is_admin(update.effective_user.id):
+    if not admin_cache.is_admin(update.effective_user.id):
         await update.message.reply_text("Access denied.")
         return
 
-    users = get_all_users()
+    context.user_data.pop("user_search", None)
+    context.user_data.pop("users_selected", None)
+    text, reply_markup = await _render_users_page(context, after_id=0)
+    await update.message.reply_text(text, reply_markup=reply_markup)
 
-    if not users:
-        await update.message.reply_text("No registered users.")
+
+async def search_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user is None or update.message is None:
         return
 
-    for user in users:
-        _, name, phone, telegram_id = user
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.message.reply_text("Access denied.")
+        return
 
-        text = f"Name: {name}\nPhone: {phone}\nTelegram ID: {telegram_id}"
+    search = " ".join(context.args or []).strip()
+    if not search:
+        await update.message.reply_text("Usage: /users <name or phone>")
+        return
 
-        reply_markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        "❌ Delete",
-                        callback_data=f"delete_user_{telegram_id}",
-                    )
-                ]
-            ]
+    context.user_data["user_search"] = search
+    context.user_data.pop("users_selected", None)
+    text, reply_markup = await _render_users_page(context, after_id=0)
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+async def handle_users_page_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    if update.effective_user is None or update.callback_query is None:
+        return
+
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.callback_query.answer("Access denied.", show_alert=True)
+        return
+
+    data = update.callback_query.data or ""
+    direction, _, anchor_text = data.replace("users_", "", 1).partition("_")
+
+    if not anchor_text.isdigit():
+        await update.callback_query.answer("Invalid page.", show_alert=True)
+        return
+
+    if direction == "prev":
+        text, reply_markup = await _render_users_page(context, before_id=int(anchor_text))
+    else:
+        text, reply_markup = await _render_users_page(context, after_id=int(anchor_text))
+
+    await update.callback_query.edit_message_text(text, reply_markup=reply_markup)
+    await update.callback_query.answer()
+
+
+async def _render_users_page(
+    context: ContextTypes.DEFAULT_TYPE,
+    after_id: int | None = None,
+    before_id: int | None = None,
+):
+    """Build the text and keyboard of one page of the user browser."""
+    search = context.user_data.get("user_search")
+
+    if before_id is not None:
+        rows = await get_users_page_before(before_id, USERS_PAGE_SIZE + 1, search)
+        has_prev = len(rows) > USERS_PAGE_SIZE
+        users = list(reversed(rows[:USERS_PAGE_SIZE]))
+        has_next = True
+    else:
+        rows = await get_users_page(after_id, USERS_PAGE_SIZE + 1, search)
+        has_next = len(rows) > USERS_PAGE_SIZE
+        users = rows[:USERS_PAGE_SIZE]
+        has_prev = after_id > 0
+
+    if not users:
+        if search:
+            return f"No users found for \"{search}\".", None
+        return "No registered users.", None
+
+    # Remembered so the page can be redrawn in place after a delete
+    context.user_data["users_page_after"] = users[0][0] - 1
+
+    header = f"Users matching \"{search}\":" if search else "Registered users:"
+    lines = [header, ""]
+    for _, name, phone, telegram_id in users:
+        lines.append(f"{name} | {phone} | {telegram_id}")
+
+    return "\n".join(lines), build_users_page_keyboard(
+        users, has_prev, has_next, context.user_data.get("users_selected")
+    )
+
+
+async def handle_users_selection_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    """Checkbox mode of the user browser; deletes the selection in one batch."""
+    if update.effective_user is None or update.callback_query is None:
+        return
+
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.callback_query.answer("Access denied.", show_alert=True)
+        return
+
+    query = update.callback_query
+    action = (query.data or "").replace("users_", "", 1)
+    notice = None
+
+    if action == "select":
+        context.user_data["users_selected"] = []
+    elif action == "cancel":
+        context.user_data.pop("users_selected", None)
+    elif action.startswith("toggle_"):
+        selected = context.user_data.setdefault("users_selected", [])
+        _toggle(selected, int(action.replace("toggle_", "", 1)))
+    elif action == "delete":
+        selected = context.user_data.get("users_selected") or []
+        if not selected:
+            await query.answer("No users selected.")
+            return
+        await query.edit_message_text(
+            f"Delete {len(selected)} selected users? This cannot be undone.",
+            reply_markup=build_delete_confirm_keyboard("users"),
         )
+        await query.answer()
+        return
+    elif action == "confirm":
+        selected = context.user_data.pop("users_selected", None) or []
+        deleted = await delete_users_by_telegram_ids(selected) if selected else 0
+        notice = "Delete failed." if deleted is None else f"{deleted} users deleted."
+
+    text, reply_markup = await _render_users_page(
+        context, after_id=context.user_data.get("users_page_after", 0)
+    )
+    await query.edit_message_text(text, reply_markup=reply_markup)
+    await query.answer(notice)
 
-        await update.message.reply_text(text, reply_markup=reply_markup)
+
+def _toggle(selected: list[int], item_id: int) -> None:
+    # A list rather than a set, so user_data stays JSON-serialisable
+    if item_id in selected:
+        selected.remove(item_id)
+    else:
+        selected.append(item_id)
 
 
 async def handle_delete_user_callback(
@@ -143,7 +277,7 @@ async def handle_delete_user_callback(
     if update.effective_user is None or update.callback_query is None:
         return
 
-    if not is_admin(update.effective_user.id):
+    if not admin_cache.is_admin(update.effective_user.id):
         await update.callback_query.answer("Access denied.", show_alert=True)
         return
 
@@ -158,23 +292,24 @@ async def handle_delete_user_callback(
         await update.callback_query.answer("Invalid user ID.", show_alert=True)
         return
 
-    delete_user_by_telegram_id(int(telegram_id_text))
+    await delete_user_by_telegram_id(int(telegram_id_text))
 
-    await update.callback_query.edit_message_text(
-        "User deleted successfully."
+    text, reply_markup = await _render_users_page(
+        context, after_id=context.user_data.get("users_page_after", 0)
     )
-    await update.callback_query.answer()
+    await update.callback_query.edit_message_text(text, reply_markup=reply_markup)
+    await update.callback_query.answer("User deleted successfully.")
 
 
 async def manage_videos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if update.effective_user is None or update.message is None:
         return
 
-    if not is_admin(update.effective_user.id):
+    if not admin_cache.is_admin(update.effective_user.id):
         await update.message.reply_text("Access denied.")
         return
 
-    videos = get_all_videos_with_id()
+    videos = await get_all_videos_with_id()
 
     if not videos:
         await update.message.reply_text("No videos available.")
@@ -198,6 +333,119 @@ async def manage_videos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
         await update.message.reply_text(text, reply_markup=reply_markup)
 
+    await update.message.reply_text(
+        "Delete several videos at once:", reply_markup=build_videos_select_keyboard()
+    )
+
+
+async def top_videos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user is None or update.message is None:
+        return
+
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.message.reply_text("Access denied.")
+        return
+
+    days = TOP_VIDEOS_DAYS
+    if context.args and context.args[0].isdigit() and int(context.args[0]) > 0:
+        days = int(context.args[0])
+
+    # Reads the daily rollups only, never the raw view events
+    rows = await get_top_videos(days, TOP_VIDEOS_LIMIT)
+    if not rows:
+        await update.message.reply_text(f"No video views in the last {days} days.")
+        return
+
+    lines = [f"Top videos, last {days} days:", ""]
+    for position, (title, views) in enumerate(rows, start=1):
+        lines.append(f"{position}. {title} — {views} views")
+    await update.message.reply_text("\n".join(lines))
+
+
+async def export_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user is None or update.message is None:
+        return
+
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.message.reply_text("Access denied.")
+        return
+
+    await update.message.reply_text("Preparing the users export...")
+
+    # Rows stream from COPY through gzip into a temp file on disk. Sending it is
+    # not streamed: PTB reads the whole document into memory to upload it, so
+    # peak memory is the compressed size, at most EXPORT_MAX_BYTES.
+    with tempfile.TemporaryFile() as export_file:
+        with gzip.GzipFile(
+            filename="users.csv", mode="wb", fileobj=export_file,
+            compresslevel=EXPORT_COMPRESSLEVEL,
+        ) as archive:
+            rows = await export_users_csv(archive)
+
+        if rows is None:
+            await update.message.reply_text("Export failed, please try again later.")
+            return
+
+        size = export_file.tell()
+        if size > EXPORT_MAX_BYTES:
+            await update.message.reply_text(
+                f"The export is {size / 1024 / 1024:.1f} MB compressed, over the "
+                f"{EXPORT_MAX_BYTES // 1024 // 1024} MB Telegram accepts for uploads."
+            )
+            return
+
+        export_file.seek(0)
+        await update.message.reply_document(
+            document=export_file,
+            filename=f"users-{date.today().isoformat()}.csv.gz",
+            caption=f"{rows} users",
+        )
+
+
+async def import_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user is None or update.message is None:
+        return
+
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.message.reply_text("Access denied.")
+        return
+
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text("The file is too large, the limit is 20 MB.")
+        return
+
+    await update.message.reply_text("Importing users...")
+
+    telegram_file = await document.get_file()
+    with tempfile.TemporaryFile() as upload:
+        await telegram_file.download_to_memory(upload)
+        upload.seek(0)
+        if document.file_name.lower().endswith(".gz"):
+            with gzip.GzipFile(mode="rb", fileobj=upload) as archive:
+                summary = await import_users_csv(archive)
+        else:
+            summary = await import_users_csv(upload)
+
+    if summary is None:
+        await update.message.reply_text(
+            "Import failed. Send a UTF-8 CSV file with a header row naming "
+            "telegram_id, name and phone."
+        )
+        return
+
+    lines = [
+        "Import finished:",
+        f"Inserted: {summary['inserted']}",
+        f"Updated: {summary['updated']}",
+        f"Unchanged: {summary['unchanged']}",
+        f"Rejected: {summary['rejected']}",
+    ]
+    if summary["rejected_rows"]:
+        rows = ", ".join(str(row) for row in summary["rejected_rows"])
+        lines.append(f"First rejected rows: {rows}")
+    await update.message.reply_text("\n".join(lines))
+
 
 async def handle_delete_video_callback(
     update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -205,7 +453,7 @@ async def handle_delete_video_callback(
     if update.effective_user is None or update.callback_query is None:
         return
 
-    if not is_admin(update.effective_user.id):
+    if not admin_cache.is_admin(update.effective_user.id):
         await update.callback_query.answer("Access denied.", show_alert=True)
         return
 
@@ -220,7 +468,7 @@ async def handle_delete_video_callback(
         await update.callback_query.answer("Invalid video ID.", show_alert=True)
         return
 
-    delete_video_by_id(int(video_id_text))
+    await delete_video_by_id(int(video_id_text))
 
     await update.callback_query.edit_message_text(
         "Video deleted successfully."
@@ -228,6 +476,94 @@ async def handle_delete_video_callback(
     await update.callback_query.answer()
 
 
+async def handle_videos_selection_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    """Paged checkbox list of videos; deletes the selection in one batch."""
+    if update.effective_user is None or update.callback_query is None:
+        return
+
+    if not admin_cache.is_admin(update.effective_user.id):
+        await update.callback_query.answer("Access denied.", show_alert=True)
+        return
+
+    query = update.callback_query
+    action = (query.data or "").replace("videos_", "", 1)
+    page_after = context.user_data.get("videos_page_after", 0)
+    notice = None
+
+    if action == "select":
+        context.user_data["videos_selected"] = []
+        page_after = 0
+    elif action == "cancel":
+        context.user_data.pop("videos_selected", None)
+        context.user_data.pop("videos_page_after", None)
+        await query.edit_message_text("Selection cancelled.")
+        await query.answer()
+        return
+    elif action.startswith("toggle_"):
+        selected = context.user_data.setdefault("videos_selected", [])
+        _toggle(selected, int(action.replace("toggle_", "", 1)))
+    elif action == "delete":
+        selected = context.user_data.get("videos_selected") or []
+        if not selected:
+            await query.answer("No videos selected.")
+            return
+        await query.edit_message_text(
+            f"Delete {len(selected)} selected videos? This cannot be undone.",
+            reply_markup=build_delete_confirm_keyboard("videos"),
+        )
+        await query.answer()
+        return
+    elif action == "confirm":
+        selected = context.user_data.get("videos_selected") or []
+        deleted = await delete_videos_by_ids(selected) if selected else 0
+        context.user_data["videos_selected"] = []
+        notice = "Delete failed." if deleted is None else f"{deleted} videos deleted."
+
+    if action.startswith("prev_"):
+        text, reply_markup = await _render_videos_page(
+            context, before_id=int(action.replace("prev_", "", 1))
+        )
+    elif action.startswith("next_"):
+        text, reply_markup = await _render_videos_page(
+            context, after_id=int(action.replace("next_", "", 1))
+        )
+    else:
+        text, reply_markup = await _render_videos_page(context, after_id=page_after)
+
+    await query.edit_message_text(text, reply_markup=reply_markup)
+    await query.answer(notice)
+
+
+async def _render_videos_page(
+    context: ContextTypes.DEFAULT_TYPE,
+    after_id: int | None = None,
+    before_id: int | None = None,
+):
+    """Build the text and keyboard of one page of the video checkbox list."""
+    if before_id is not None:
+        rows = await get_videos_page_before(before_id, VIDEOS_PAGE_SIZE + 1)
+        has_prev = len(rows) > VIDEOS_PAGE_SIZE
+        videos = list(reversed(rows[:VIDEOS_PAGE_SIZE]))
+        has_next = True
+    else:
+        rows = await get_videos_page(after_id, VIDEOS_PAGE_SIZE + 1)
+        has_next = len(rows) > VIDEOS_PAGE_SIZE
+        videos = rows[:VIDEOS_PAGE_SIZE]
+        has_prev = after_id > 0
+
+    if not videos:
+        context.user_data.pop("videos_selected", None)
+        return "No videos available.", None
+
+    context.user_data["videos_page_after"] = videos[0][0] - 1
+    selected = context.user_data.setdefault("videos_selected", [])
+
+    text = f"Select videos to delete ({len(selected)} selected):"
+    return text, build_videos_page_keyboard(videos, has_prev, has_next, selected)
+
+
 admin_add_video_handler = ConversationHandler(
     entry_points=[
         MessageHandler(filters.Regex(r"^Add Video$") & filters.TEXT, add_video_start)
@@ -241,6 +577,8 @@ admin_add_video_handler = ConversationHandler(
         ],
     },
     fallbacks=[],
+    name="add_video",
+    persistent=True,
     block=True,
 )
 
@@ -250,12 +588,54 @@ admin_view_users_handler = MessageHandler(
     block=True,
 )
 
+admin_search_users_handler = CommandHandler("users", search_users, block=True)
+
+admin_users_page_callback_handler = CallbackQueryHandler(
+    handle_users_page_callback,
+    pattern=r"^users_(next|prev)_\d+$",
+    block=True,
+)
+
+admin_users_selection_callback_handler = CallbackQueryHandler(
+    handle_users_selection_callback,
+    pattern=r"^users_(select|toggle_\d+|delete|back|confirm|cancel)$",
+    block=True,
+)
+
 admin_manage_videos_handler = MessageHandler(
     filters.Regex(r"^Manage Videos$") & filters.TEXT,
     manage_videos,
     block=True,
 )
 
+admin_videos_selection_callback_handler = CallbackQueryHandler(
+    handle_videos_selection_callback,
+    pattern=r"^videos_(select|next_\d+|prev_\d+|toggle_\d+|delete|back|confirm|cancel)$",
+    block=True,
+)
+
+admin_top_videos_handler = MessageHandler(
+    filters.Regex(r"^Top Videos$") & filters.TEXT,
+    top_videos,
+    block=True,
+)
+
+admin_top_videos_command_handler = CommandHandler("top", top_videos, block=True)
+
+admin_export_users_handler = MessageHandler(
+    filters.Regex(r"^Export Users$") & filters.TEXT,
+    export_users,
+    block=True,
+)
+
+admin_export_users_command_handler = CommandHandler("export", export_users, block=True)
+
+admin_import_users_handler = MessageHandler(
+    filters.Document.FileExtension("csv") | filters.Document.FileExtension("csv.gz"),
+    import_users,
+    block=True,
+)
+
 admin_delete_user_callback_handler = CallbackQueryHandler(
     handle_delete_user_callback,
     pattern=r"^delete_user_\d+$",
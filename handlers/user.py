@@ -1,23 +1,36 @@
-from telegram import KeyboardButton, ReplyKeyboardMarkup, Update
-from telegram.ext import CommandHandler, ContextTypes, ConversationHandler, MessageHandler, filters
-
-from config import ADMIN_ID
-from database import (
-    create_user,
-    get_all_videos,
-    get_user_by_telegram_id,
-    get_video_by_title,
+from telegram import (
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+    Update,
 )
+from telegram.ext import (
+    CallbackQueryHandler,
+    CommandHandler,
+    ContextTypes,
+    ConversationHandler,
+    InlineQueryHandler,
+    MessageHandler,
+    filters,
+)
+
+from catalog import video_catalog
+from config import ADMIN_ID, INLINE_CACHE_TIME
+from async_database import create_user, search_videos
+from user_registry import user_registry
+from view_analytics import view_recorder
 
 NAME, PHONE = range(2)
+INLINE_RESULTS_LIMIT = 20
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if update.effective_user is None or update.message is None:
         return ConversationHandler.END
 
-    existing_user = get_user_by_telegram_id(update.effective_user.id)
-    if existing_user:
+    if update.effective_user.id in user_registry:
         await _send_video_menu(update, "Welcome back! Choose a video below.")
         return ConversationHandler.END
 
@@ -58,11 +71,16 @@ async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text("Please enter your full name:")
         return NAME
 
-    create_user(update.effective_user.id, name, contact.phone_number)
+    if not await create_user(update.effective_user.id, name, contact.phone_number):
+        await update.message.reply_text(
+            "Registration failed, please share your phone number again in a moment."
+        )
+        return PHONE
+    # Known here at once; other workers learn of it through the registry NOTIFY
+    user_registry.add(update.effective_user.id)
 
-    videos = get_all_videos()
-    if videos:
-        reply_markup = _build_videos_keyboard([video[1] for video in videos])
+    reply_markup = video_catalog.snapshot.page_keyboard(0)
+    if reply_markup is not None:
         await update.message.reply_text(
             "Registration successful! Choose a video below.", reply_markup=reply_markup
         )
@@ -76,42 +94,94 @@ async def handle_video_selection(update: Update, context: ContextTypes.DEFAULT_T
     if update.effective_user is None or update.message is None:
         return
 
-    existing_user = get_user_by_telegram_id(update.effective_user.id)
-    if not existing_user:
+    if update.effective_user.id not in user_registry:
         return
 
     title = (update.message.text or "").strip()
     if not title:
         return
 
-    video = get_video_by_title(title)
-    if not video:
+    youtube_link = video_catalog.get_link(title)
+    if not youtube_link:
+        return
+
+    view_recorder.record(update.effective_user.id, video_catalog.get_video_id(title))
+    await update.message.reply_text(f"Here is your video:\n{youtube_link}")
+
+
+async def handle_video_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user is None or update.callback_query is None:
+        return
+
+    if update.effective_user.id not in user_registry:
+        await update.callback_query.answer("Please register with /start first.", show_alert=True)
+        return
+
+    video_id = int((update.callback_query.data or "").replace("video_", "", 1))
+    youtube_link = video_catalog.get_link_by_id(video_id)
+    if not youtube_link:
+        await update.callback_query.answer("This video is no longer available.", show_alert=True)
+        return
+
+    view_recorder.record(update.effective_user.id, video_id)
+    await update.callback_query.answer()
+    await update.callback_query.message.reply_text(f"Here is your video:\n{youtube_link}")
+
+
+async def handle_videos_page_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    if update.callback_query is None:
+        return
+
+    page = int((update.callback_query.data or "").replace("videos_page_", "", 1))
+    reply_markup = video_catalog.snapshot.page_keyboard(page)
+    if reply_markup is None:
+        await update.callback_query.answer("No videos available yet.")
         return
 
-    await update.message.reply_text(f"Here is your video:\n{video[2]}")
+    await update.callback_query.answer()
+    if reply_markup != update.callback_query.message.reply_markup:
+        await update.callback_query.edit_message_reply_markup(reply_markup=reply_markup)
 
 
-def _build_videos_keyboard(titles: list[str]) -> ReplyKeyboardMarkup:
-    rows: list[list[str]] = []
-    row: list[str] = []
-    for title in titles:
-        row.append(title)
-        if len(row) == 2:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
-    return ReplyKeyboardMarkup(rows, resize_keyboard=True)
+async def inline_video_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user is None or update.inline_query is None:
+        return
+
+    inline_query = update.inline_query
+    if update.effective_user.id not in user_registry:
+        await inline_query.answer(
+            [],
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=True,
+            button=InlineQueryResultsButton("Register to search videos", start_parameter="register"),
+        )
+        return
+
+    query = inline_query.query.strip()
+    videos = video_catalog.snapshot.search_index.search(query, INLINE_RESULTS_LIMIT)
+    if not videos and len(query) >= 3:
+        videos = await search_videos(query, INLINE_RESULTS_LIMIT)
+
+    results = [
+        InlineQueryResultArticle(
+            id=str(video_id),
+            title=title,
+            description=youtube_link,
+            input_message_content=InputTextMessageContent(f"{title}\n{youtube_link}"),
+        )
+        for video_id, title, youtube_link, _ in videos
+    ]
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
 
 
 async def _send_video_menu(update: Update, prompt_text: str) -> None:
-    videos = get_all_videos()
-    if not videos:
+    reply_markup = video_catalog.snapshot.page_keyboard(0)
+    if reply_markup is None:
         await update.message.reply_text("No videos available yet.")
         return
 
-    titles = [video[1] for video in videos]
-    reply_markup = _build_videos_keyboard(titles)
     await update.message.reply_text(prompt_text, reply_markup=reply_markup)
 
 
@@ -122,10 +192,25 @@ registration_handler = ConversationHandler(
         PHONE: [MessageHandler(filters.CONTACT, handle_contact)],
     },
     fallbacks=[],
+    name="registration",
+    persistent=True,
     block=True,
 )
 
+# Still serves taps on reply keyboards sent before the inline catalog existed
 video_selection_handler = MessageHandler(
     filters.TEXT & ~filters.COMMAND,
     handle_video_selection,
 )
+
+video_callback_handler = CallbackQueryHandler(
+    handle_video_callback,
+    pattern=r"^video_\d+$",
+)
+
+inline_search_handler = InlineQueryHandler(inline_video_search)
+
+videos_page_callback_handler = CallbackQueryHandler(
+    handle_videos_page_callback,
+    pattern=r"^videos_page_\d+$",
+)
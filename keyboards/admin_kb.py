@@ -1,2 +1,99 @@
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Longest title shown on a video checkbox button
+VIDEO_LABEL_LENGTH = 40
+
+
 def admin_main_keyboard():
     return None
+
+
+def build_users_page_keyboard(
+    users, has_prev: bool, has_next: bool, selected: list[int] | None = None
+) -> InlineKeyboardMarkup:
+    """Delete buttons per user, or checkboxes while `selected` is not None."""
+    if selected is None:
+        rows = [
+            [
+                InlineKeyboardButton(
+                    f"❌ Delete {name}",
+                    callback_data=f"delete_user_{telegram_id}",
+                )
+            ]
+            for _, name, _, telegram_id in users
+        ]
+    else:
+        rows = [
+            [_checkbox_button(name, telegram_id in selected, f"users_toggle_{telegram_id}")]
+            for _, name, _, telegram_id in users
+        ]
+
+    rows.extend(_navigation_rows("users", users, has_prev, has_next))
+    if selected is None:
+        rows.append([InlineKeyboardButton("☑️ Select several", callback_data="users_select")])
+    else:
+        rows.append(_selection_actions("users", len(selected)))
+    return InlineKeyboardMarkup(rows)
+
+
+def build_videos_page_keyboard(
+    videos, has_prev: bool, has_next: bool, selected: list[int]
+) -> InlineKeyboardMarkup:
+    rows = [
+        [
+            _checkbox_button(
+                _shorten(title, VIDEO_LABEL_LENGTH),
+                video_id in selected,
+                f"videos_toggle_{video_id}",
+            )
+        ]
+        for video_id, title in videos
+    ]
+    rows.extend(_navigation_rows("videos", videos, has_prev, has_next))
+    rows.append(_selection_actions("videos", len(selected)))
+    return InlineKeyboardMarkup(rows)
+
+
+def build_videos_select_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton("☑️ Select several", callback_data="videos_select")]]
+    )
+
+
+def build_delete_confirm_keyboard(prefix: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton("✅ Confirm", callback_data=f"{prefix}_confirm"),
+                InlineKeyboardButton("⬅️ Back", callback_data=f"{prefix}_back"),
+            ]
+        ]
+    )
+
+
+def _checkbox_button(label: str, checked: bool, callback_data: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton(f"{'✅' if checked else '⬜'} {label}", callback_data=callback_data)
+
+
+def _navigation_rows(prefix: str, items, has_prev: bool, has_next: bool) -> list:
+    navigation = []
+    if has_prev:
+        navigation.append(
+            InlineKeyboardButton("⬅️ Prev", callback_data=f"{prefix}_prev_{items[0][0]}")
+        )
+    if has_next:
+        navigation.append(
+            InlineKeyboardButton("Next ➡️", callback_data=f"{prefix}_next_{items[-1][0]}")
+        )
+    return [navigation] if navigation else []
+
+
+def _selection_actions(prefix: str, count: int) -> list:
+    return [
+        InlineKeyboardButton(f"🗑 Delete selected ({count})", callback_data=f"{prefix}_delete"),
+        InlineKeyboardButton("Cancel", callback_data=f"{prefix}_cancel"),
+    ]
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
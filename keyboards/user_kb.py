@@ -1,2 +1,28 @@
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
 def user_main_keyboard():
     return None
+
+
+def build_videos_page_keyboard(videos, page: int, page_count: int) -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(title, callback_data=f"video_{video_id}")]
+        for video_id, title, _, _ in videos
+    ]
+
+    if page_count > 1:
+        navigation = []
+        if page > 0:
+            navigation.append(
+                InlineKeyboardButton("⬅️", callback_data=f"videos_page_{page - 1}")
+            )
+        navigation.append(
+            InlineKeyboardButton(f"{page + 1}/{page_count}", callback_data=f"videos_page_{page}")
+        )
+        if page < page_count - 1:
+            navigation.append(
+                InlineKeyboardButton("➡️", callback_data=f"videos_page_{page + 1}")
+            )
+        rows.append(navigation)
+    return InlineKeyboardMarkup(rows)
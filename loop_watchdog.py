@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from config import LOOP_BLOCK_THRESHOLD, LOOP_WATCHDOG_INTERVAL
+from metrics import GaugeFunc, loop_blocks, loop_lag
+
+logger = logging.getLogger(__name__)
+
+# Lag samples kept for /health percentiles; a minute at the default interval
+LAG_SAMPLES = 600
+
+
+class LoopWatchdog:
+    """Measures event loop lag and reports what the loop is stuck on.
+
+    A task on the loop sleeps for `interval` over and over, records how late
+    it woke up and stamps a heartbeat. A separate thread watches the
+    heartbeat; once it is older than `threshold` the loop is blocked, and
+    the watchdog logs the loop thread's current stack, then the total stall
+    once the loop runs again.
+    """
+
+    def __init__(
+        self, interval: float = LOOP_WATCHDOG_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.blocks = 0
+        self.last_block_stack: list[str] = []
+        self._samples: deque[float] = deque(maxlen=LAG_SAMPLES)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start watching the running loop; call from a coroutine on it."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def lag_percentiles(self) -> dict:
+        """Lag over the recent samples, in milliseconds."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {}
+
+        def at(fraction: float) -> float:
+            return round(samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000, 2)
+
+        return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": at(1.0)}
+
+    def stats(self) -> dict:
+        return {
+            "lag_ms": self.lag_percentiles(),
+            "blocks": self.blocks,
+            "last_block": self.last_block_stack[-3:],
+        }
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - due)
+            self._heartbeat = time.monotonic()
+            self._samples.append(self.last_lag)
+            loop_lag.observe(self.last_lag)
+
+    def _watch(self) -> None:
+        blocked_since = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold:
+                if blocked_since is not None:
+                    logger.warning(
+                        f"Event loop was blocked for {heartbeat - blocked_since:.2f}s"
+                    )
+                    blocked_since = None
+                continue
+            if blocked_since is not None:
+                continue
+
+            # First sighting of this stall: grab the stack while it is still stuck
+            blocked_since = heartbeat + self.interval
+            self.blocks += 1
+            loop_blocks.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.format_stack(frame) if frame is not None else []
+            self.last_block_stack = [line.strip() for line in stack]
+            logger.warning(
+                f"Event loop blocked for over {self.threshold:.2f}s, loop thread stack:\n"
+                + "".join(stack)
+            )
+
+
+loop_watchdog = LoopWatchdog()
+
+GaugeFunc(
+    "bot_event_loop_lag_last_seconds",
+    "Loop lag measured by the most recent sample.",
+    lambda: loop_watchdog.last_lag,
+)
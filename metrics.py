@@ -0,0 +1,293 @@
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from telegram.ext import Application, BaseHandler, ConversationHandler
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached lookup up to a slow Bot API round trip
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY: list = []
+
+
+class _Metric:
+    """Base for counters and histograms with lock-free updates.
+
+    Every thread writes to its own shard per label set, so the event loop
+    thread and the DB executor threads never contend or lose increments.
+    The lock is taken only the first time a thread sees a label set, and
+    when /metrics adds the shards up.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[tuple[tuple, object]] = []
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self, labels: tuple):
+        shards = getattr(self._local, "shards", None)
+        if shards is None:
+            shards = self._local.shards = {}
+        shard = shards.get(labels)
+        if shard is None:
+            shard = shards[labels] = self._new_shard()
+            with self._lock:
+                self._shards.append((labels, shard))
+        return shard
+
+    def _merged(self) -> dict:
+        merged: dict[tuple, list] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for labels, shard in shards:
+            total = merged.get(labels)
+            if total is None:
+                merged[labels] = list(shard)
+            else:
+                for index, value in enumerate(shard):
+                    total[index] += value
+        return merged
+
+    def _label_text(self, labels: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _new_shard(self) -> list:
+        raise NotImplementedError
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._shard(labels)[0] += amount
+
+    def _new_shard(self) -> list:
+        return [0]
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{self._label_text(labels)} {values[0]}"
+            for labels, values in sorted(self._merged().items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels) -> None:
+        # Shard layout: one count per bucket, then +Inf, sum, count
+        shard = self._shard(labels)
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def _new_shard(self) -> list:
+        return [0] * (len(self.buckets) + 3)
+
+    def samples(self) -> list[str]:
+        lines = []
+        bounds = [*(repr(float(bound)) for bound in self.buckets), "+Inf"]
+        for labels, values in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {values[-2]}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {values[-1]}")
+        return lines
+
+
+class GaugeFunc:
+    """Gauge read from a callback at scrape time; nothing runs on the hot path.
+
+    With `labelnames`, the callback returns a dict of label tuple -> value.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, func, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def samples(self) -> list[str]:
+        try:
+            value = self.func()
+        except Exception as exc:
+            logger.warning(f"Gauge {self.name} failed: {exc}")
+            return []
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [f"{self.name} {value}"]
+        lines = []
+        for labels, labelled_value in sorted(value.items()):
+            pairs = ",".join(
+                f'{name}="{_escape(label)}"' for name, label in zip(self.labelnames, labels)
+            )
+            lines.append(f"{self.name}{{{pairs}}} {labelled_value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    """Return every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+handler_calls = Counter(
+    "bot_handler_calls_total", "Handler callbacks run, by outcome.", ("handler", "outcome")
+)
+handler_duration = Histogram(
+    "bot_handler_duration_seconds", "Handler callback run time.", ("handler",)
+)
+db_call_duration = Histogram(
+    "bot_db_call_duration_seconds", "Database call run time on the DB executor.", ("function",)
+)
+bot_api_requests = Counter(
+    "bot_api_requests_total", "Bot API requests, by HTTP status or error.", ("method", "status")
+)
+bot_api_duration = Histogram(
+    "bot_api_request_duration_seconds", "Bot API request round trip.", ("method",)
+)
+loop_lag = Histogram(
+    "bot_event_loop_lag_seconds",
+    "How late the bot event loop ran a timer due now.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+loop_blocks = Counter(
+    "bot_event_loop_blocks_total", "Times the bot event loop stalled past the block threshold."
+)
+
+
+def timed_handler(callback):
+    """Wrap a handler callback so its calls and run time are recorded."""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            result = await callback(update, context)
+        except Exception:
+            handler_calls.inc(name, "error")
+            handler_duration.observe(time.perf_counter() - started, name)
+            raise
+        handler_calls.inc(name, "ok")
+        handler_duration.observe(time.perf_counter() - started, name)
+        return result
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def iter_callback_handlers(application: Application):
+    """Yield every handler that runs a callback, including conversation states."""
+
+    def walk(handler: BaseHandler):
+        if isinstance(handler, ConversationHandler):
+            nested = [*handler.entry_points, *handler.fallbacks]
+            for handlers in handler.states.values():
+                nested.extend(handlers)
+            for inner in nested:
+                yield from walk(inner)
+        elif getattr(handler, "callback", None) is not None:
+            yield handler
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            yield from walk(handler)
+
+
+def instrument_handlers(application: Application) -> None:
+    """Time every handler callback registered on the application."""
+    for handler in iter_callback_handlers(application):
+        if not getattr(handler.callback, "__metrics_wrapped__", False):
+            handler.callback = timed_handler(handler.callback)
+
+
+def call_timed(func, *args, **kwargs):
+    """Run a blocking database call, recording its run time in the calling thread."""
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        name = getattr(func, "__qualname__", None) or getattr(func, "__name__", "unknown")
+        db_call_duration.observe(time.perf_counter() - started, name)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API latency and status per method."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception as exc:
+            bot_api_requests.inc(api_method, type(exc).__name__)
+            bot_api_duration.observe(time.perf_counter() - started, api_method)
+            raise
+        bot_api_requests.inc(api_method, str(status))
+        bot_api_duration.observe(time.perf_counter() - started, api_method)
+        return status, payload
+
+
+_update_queue = None
+
+
+def watch_update_queue(queue) -> None:
+    """Export the depth of the webhook update queue, or nothing when it is off."""
+    global _update_queue
+    _update_queue = queue
+
+
+def _queue_stat(key: str):
+    queue = _update_queue
+    return queue.stats()[key] if queue is not None else None
+
+
+GaugeFunc(
+    "bot_webhook_queue_depth",
+    "Updates waiting in the webhook queue.",
+    lambda: _queue_stat("depth"),
+)
+GaugeFunc(
+    "bot_webhook_queue_in_flight",
+    "Updates being processed by queue workers.",
+    lambda: _queue_stat("in_flight"),
+)
@@ -0,0 +1,176 @@
+"""
+Schema migrations, applied in order by database.migrate().
+
+Each entry is (version, description, statements). Applied versions are
+recorded in schema_version; never edit a migration that has shipped, add a
+new one instead. Version 1 uses IF NOT EXISTS so that databases created
+before migrations existed are adopted as-is.
+"""
+
+MIGRATIONS = [
+    (
+        1,
+        "baseline schema",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                telegram_id BIGINT UNIQUE NOT NULL,
+                name VARCHAR(255) NOT NULL,
+                phone VARCHAR(20) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS videos (
+                id SERIAL PRIMARY KEY,
+                title VARCHAR(255) NOT NULL,
+                youtube_link TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS admins (
+                id SERIAL PRIMARY KEY,
+                telegram_id BIGINT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id SERIAL PRIMARY KEY,
+                admin_chat_id BIGINT NOT NULL,
+                text TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'running',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                broadcast_id INTEGER NOT NULL REFERENCES broadcasts (id) ON DELETE CASCADE,
+                telegram_id BIGINT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                error TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (broadcast_id, telegram_id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS bot_persistence (
+                kind VARCHAR(64) NOT NULL,
+                key TEXT NOT NULL,
+                data JSONB NOT NULL,
+                version BIGINT NOT NULL DEFAULT 1,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, key)
+            )
+            """,
+        ],
+    ),
+    (
+        2,
+        "indexes for hot lookups",
+        [
+            # get_video_by_title
+            "CREATE INDEX IF NOT EXISTS videos_title_idx ON videos (title)",
+            # Newest-first user listings
+            "CREATE INDEX IF NOT EXISTS users_created_at_idx ON users (created_at)",
+            # get_pending_recipients only ever reads pending rows
+            """
+            CREATE INDEX IF NOT EXISTS broadcast_recipients_pending_idx
+            ON broadcast_recipients (broadcast_id, telegram_id)
+            WHERE status = 'pending'
+            """,
+            "CREATE INDEX IF NOT EXISTS broadcasts_running_idx ON broadcasts (id) WHERE status = 'running'",
+        ],
+    ),
+    (
+        3,
+        "trigram indexes for user and video search",
+        [
+            # Optional: search works without it, only slower. Skipped, with a
+            # warning, when the server lacks pg_trgm or refuses CREATE EXTENSION,
+            # so the required migrations after this one still apply.
+            """
+            DO $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+                    BEGIN
+                        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                    EXCEPTION WHEN insufficient_privilege THEN
+                        RAISE WARNING 'Not allowed to create pg_trgm, skipping trigram indexes';
+                    END;
+                ELSE
+                    RAISE WARNING 'pg_trgm is not available, skipping trigram indexes';
+                END IF;
+
+                IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                    CREATE INDEX IF NOT EXISTS users_name_trgm_idx
+                        ON users USING gin (name gin_trgm_ops);
+                    CREATE INDEX IF NOT EXISTS users_phone_trgm_idx
+                        ON users USING gin (phone gin_trgm_ops);
+                    CREATE INDEX IF NOT EXISTS videos_title_trgm_idx
+                        ON videos USING gin (title gin_trgm_ops);
+                END IF;
+            END
+            $$
+            """,
+        ],
+    ),
+    (
+        4,
+        "processed webhook updates for redelivery deduplication",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS processed_updates (
+                update_id BIGINT PRIMARY KEY,
+                received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS processed_updates_received_at_idx ON processed_updates (received_at)",
+        ],
+    ),
+    (
+        5,
+        "video view events and daily rollups",
+        [
+            # Raw events, written in batches by COPY; viewed_at is UTC
+            """
+            CREATE TABLE IF NOT EXISTS video_views (
+                video_id INTEGER NOT NULL,
+                telegram_id BIGINT NOT NULL,
+                viewed_at TIMESTAMP NOT NULL
+            )
+            """,
+            # Maintained in the same transaction as each batch; reports read only this
+            """
+            CREATE TABLE IF NOT EXISTS video_view_daily (
+                day DATE NOT NULL,
+                video_id INTEGER NOT NULL,
+                views BIGINT NOT NULL,
+                PRIMARY KEY (day, video_id)
+            )
+            """,
+        ],
+    ),
+    (
+        6,
+        "broadcast leases",
+        [
+            # The worker sending a broadcast renews its lease; a lapsed lease can be claimed
+            "ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS lease_owner TEXT",
+            "ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP",
+        ],
+    ),
+    (
+        7,
+        "drop the unused users created_at index",
+        [
+            # User pages are keyset on id; nothing orders or filters users by created_at
+            "DROP INDEX IF EXISTS users_created_at_idx",
+        ],
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
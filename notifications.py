@@ -0,0 +1,88 @@
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+LISTEN_POLL_SECONDS = 5
+RECONNECT_DELAY_SECONDS = 5
+
+
+class NotificationListener:
+    """One LISTEN connection per process that fans notifications out to callbacks.
+
+    Subscribers register a callback for a channel, which receives the NOTIFY
+    payload, and optionally a resync callback that runs each time LISTEN is
+    established, the first time included, because notifications sent before
+    then are lost: those between a subscriber's initial load and the first
+    LISTEN as much as those missed while reconnecting.
+    """
+
+    def __init__(self) -> None:
+        self._callbacks: dict[str, list] = {}
+        self._resyncs: list = []
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def subscribe(self, channel: str, callback, resync=None) -> None:
+        self._callbacks.setdefault(channel, []).append(callback)
+        if resync is not None:
+            self._resyncs.append(resync)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._listen, name="pg-notification-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=LISTEN_POLL_SECONDS + 1)
+            self._thread = None
+
+    def _listen(self) -> None:
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = get_connection()
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    for channel in self._callbacks:
+                        cur.execute(f"LISTEN {channel}")
+                for resync in self._resyncs:
+                    try:
+                        resync()
+                    except Exception as exc:
+                        logger.error(f"Notification resync failed: {exc}")
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0))
+            except psycopg2.Error as exc:
+                logger.error(f"Notification listener error: {exc}")
+                time.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _dispatch(self, notify) -> None:
+        for callback in self._callbacks.get(notify.channel, []):
+            try:
+                callback(notify.payload)
+            except Exception as exc:
+                logger.error(f"Error handling {notify.channel} notification: {exc}")
+
+
+notification_listener = NotificationListener()
@@ -0,0 +1,223 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    BROADCAST_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_CHAT_RATE,
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_GROUP_RATE,
+    OUTBOUND_MAX_RETRIES,
+)
+from metrics import Counter, GaugeFunc, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Lanes passed as rate_limit_args; a lower priority number is served first
+INTERACTIVE_LANE = "interactive"
+BULK_LANE = "bulk"
+LANE_PRIORITIES = {INTERACTIVE_LANE: 0, BULK_LANE: 1}
+
+# Per-chat buckets idle this long are dropped once there are many of them
+CHAT_BUCKET_IDLE = 60.0
+CHAT_BUCKET_PRUNE_AT = 10_000
+
+outbound_wait = Histogram(
+    "bot_outbound_wait_seconds", "Time a Bot API request waited in the scheduler.", ("lane",)
+)
+outbound_retries = Counter(
+    "bot_outbound_retries_total", "Requests retried after a 429 flood wait.", ("lane",)
+)
+
+
+class TokenBucket:
+    """Async token bucket; waiters are served one at a time."""
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds`, e.g. after a flood-wait."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    def idle_since(self) -> float:
+        return self._updated
+
+    def try_take(self) -> float:
+        """Take a token and return 0, or return how long to wait for one."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                wait = self.try_take()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+
+class PriorityBucket(TokenBucket):
+    """Token bucket that hands tokens to the lowest priority number first."""
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        super().__init__(rate, capacity)
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    async def acquire(self, priority: int = 0) -> None:
+        if not self._waiters and not self.try_take():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            wait = self.try_take()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            # Skip waiters that gave up, so the token goes to a live one
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
+            else:
+                # Nobody left to take it; give the token back
+                self._tokens += 1
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Rate limiter wrapped around every Bot API call the bot makes.
+
+    Calls that send into a chat take a token from a per-chat bucket, then
+    from one global bucket that serves the interactive lane before the bulk
+    lane. The bulk lane is also capped at its own rate, so a broadcast can
+    never use the whole global budget. Other calls (answerCallbackQuery,
+    answerInlineQuery, getMe, ...) are not metered. A 429 pauses the global
+    bucket for its retry_after and the call is retried here, up to
+    OUTBOUND_MAX_RETRIES times.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = OUTBOUND_GLOBAL_RATE,
+        bulk_rate: float = BROADCAST_RATE,
+        chat_rate: float = OUTBOUND_CHAT_RATE,
+        group_rate: float = OUTBOUND_GROUP_RATE,
+        chat_burst: float = OUTBOUND_CHAT_BURST,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+    ) -> None:
+        self.global_rate = global_rate
+        self.bulk_rate = bulk_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global: PriorityBucket | None = None
+        self._lane_caps: dict[str, TokenBucket] = {}
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._queued = {lane: 0 for lane in LANE_PRIORITIES}
+
+    async def initialize(self) -> None:
+        # Buckets hold asyncio locks, so they are made on the bot's loop
+        self._global = PriorityBucket(self.global_rate)
+        self._lane_caps = {BULK_LANE: TokenBucket(self.bulk_rate)}
+        self._chats = {}
+
+    async def shutdown(self) -> None:
+        self._chats = {}
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        lane = rate_limit_args if rate_limit_args in LANE_PRIORITIES else INTERACTIVE_LANE
+        chat_id = data.get("chat_id")
+        if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+            chat_id = int(chat_id)
+
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                await self._wait_turn(lane, chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                retry_after = float(exc.retry_after)
+                self._global.pause(retry_after)
+                if attempt == self.max_retries:
+                    logger.error(f"{endpoint} still rate limited after {attempt} retries")
+                    raise
+                outbound_retries.inc(lane)
+                logger.warning(f"Flood wait of {retry_after}s on {endpoint}, retrying")
+                await asyncio.sleep(retry_after)
+        return None
+
+    def queue_lengths(self) -> dict:
+        return dict(self._queued)
+
+    def stats(self) -> dict:
+        return {"queued": self.queue_lengths(), "chats_tracked": len(self._chats)}
+
+    async def _wait_turn(self, lane: str, chat_id) -> None:
+        started = time.monotonic()
+        self._queued[lane] += 1
+        try:
+            cap = self._lane_caps.get(lane)
+            if cap is not None:
+                await cap.acquire()
+            await self._chat_bucket(chat_id).acquire()
+            await self._global.acquire(LANE_PRIORITIES[lane])
+        finally:
+            self._queued[lane] -= 1
+        outbound_wait.observe(time.monotonic() - started, lane)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKET_PRUNE_AT:
+                self._prune_chats()
+            # Negative ids and @usernames are groups and channels
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _prune_chats(self) -> None:
+        cutoff = time.monotonic() - CHAT_BUCKET_IDLE
+        self._chats = {
+            chat_id: bucket
+            for chat_id, bucket in self._chats.items()
+            if bucket.idle_since() > cutoff
+        }
+
+
+outbound_scheduler = OutboundScheduler()
+
+GaugeFunc(
+    "bot_outbound_queue_length",
+    "Bot API requests waiting in the scheduler, by lane.",
+    lambda: {(lane,): count for lane, count in outbound_scheduler.queue_lengths().items()},
+    labelnames=("lane",),
+)
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import (
+    Application,
+    BasePersistence,
+    ContextTypes,
+    ConversationHandler,
+    PersistenceInput,
+    TypeHandler,
+)
+
+from async_database import load_persistence_rows, save_persistence_rows
+from config import PERSISTENCE_FRESH_USERS, PERSISTENCE_UPDATE_INTERVAL
+from database import PERSISTENCE_CHANNEL
+from notifications import notification_listener
+
+logger = logging.getLogger(__name__)
+
+USER_DATA_KIND = "user_data"
+# Seconds between attempts to write back pending rows while the database is failing
+WRITE_RETRY_DELAYS = (1, 2, 4, 8)
+
+
+class PostgresPersistence(BasePersistence):
+    """Stores conversation states and user_data in the bot_persistence table.
+
+    Nothing is loaded at startup. Instead `refresh_update` pulls the rows for
+    the incoming update's user and chat, and only replaces the in-memory copy
+    when another worker has written a newer version. Writes from
+    `Application.update_persistence` are coalesced into a single transaction.
+
+    Once a user's rows are loaded they are trusted until another worker
+    announces a write for that user on PERSISTENCE_CHANNEL, so most updates
+    run no query at all. The trusted set is bounded and is dropped whenever
+    the notification listener reconnects.
+    """
+
+    def __init__(
+        self,
+        update_interval: float = PERSISTENCE_UPDATE_INTERVAL,
+        fresh_users: int = PERSISTENCE_FRESH_USERS,
+    ) -> None:
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self._versions: dict[tuple[str, str], int] = {}
+        self._pending: dict[tuple[str, str], object] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._origin = uuid.uuid4().hex
+        self._fresh: OrderedDict[int, None] = OrderedDict()
+        self._fresh_limit = fresh_users
+        # Notifications arrive on the listener thread
+        self._fresh_lock = threading.Lock()
+        self._listening = False
+
+    def start(self) -> None:
+        """Follow other workers' writes; until then every update is refreshed."""
+        notification_listener.subscribe(
+            PERSISTENCE_CHANNEL, self._apply_notification, resync=self._forget_all
+        )
+        self._listening = True
+
+    def _apply_notification(self, payload: str) -> None:
+        origin, kind, key = json.loads(payload)
+        if origin == self._origin:
+            return
+        if kind == USER_DATA_KIND:
+            user_id = int(key)
+        else:
+            # Conversation keys are [chat_id, user_id]
+            user_id = json.loads(key)[-1]
+        with self._fresh_lock:
+            self._fresh.pop(user_id, None)
+
+    def _forget_all(self) -> None:
+        with self._fresh_lock:
+            self._fresh.clear()
+
+    def _claim_fresh(self, user_id: int) -> bool:
+        """Return True if the user's rows are current; otherwise mark them as being loaded."""
+        with self._fresh_lock:
+            if user_id in self._fresh:
+                self._fresh.move_to_end(user_id)
+                return True
+            # Marked before the read, so a write announced during it invalidates again
+            self._fresh[user_id] = None
+            if len(self._fresh) > self._fresh_limit:
+                self._fresh.popitem(last=False)
+            return False
+
+    async def refresh_update(self, application: Application, update: Update) -> None:
+        """Bring this worker's state for the update's user and chat up to date."""
+        user = update.effective_user
+        chat = update.effective_chat
+        if user is None:
+            return
+        if self._listening and self._claim_fresh(user.id):
+            return
+
+        wanted = {(USER_DATA_KIND, str(user.id)): None}
+        if chat is not None:
+            conversation_key = (chat.id, user.id)
+            for handler in _persistent_conversation_handlers(application):
+                wanted[(_conversation_kind(handler.name), json.dumps(conversation_key))] = (
+                    handler
+                )
+
+        loaded = await load_persistence_rows(list(wanted))
+        if loaded is None:
+            # Keep what this worker has and try again on the next update
+            with self._fresh_lock:
+                self._fresh.pop(user.id, None)
+            return
+        rows = {(kind, key): (data, version) for kind, key, data, version in loaded}
+        for row_key, handler in wanted.items():
+            if row_key in self._pending:
+                continue
+            stored = rows.get(row_key)
+            if stored is None:
+                if self._versions.pop(row_key, None) is None:
+                    continue
+                data = None
+            else:
+                data, version = stored
+                if self._versions.get(row_key) == version:
+                    continue
+                self._versions[row_key] = version
+
+            if handler is None:
+                user_data = application.user_data[user.id]
+                user_data.clear()
+                user_data.update(data or {})
+            else:
+                # ConversationHandler keeps its states in a TrackingDict; update it
+                # without marking the key as written so it is not echoed back.
+                states = handler._conversations
+                key = tuple(json.loads(row_key[1]))
+                if data is None:
+                    states.data.pop(key, None)
+                else:
+                    states.update_no_track({key: data})
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._queue_write(_conversation_kind(name), json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._queue_write(USER_DATA_KIND, str(user_id), data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._queue_write(USER_DATA_KIND, str(user_id), None)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        # Handled together with conversations in `refresh_update`.
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        if not await self._write_pending():
+            logger.error(f"Could not save {len(self._pending)} persistence rows on flush")
+
+    def _queue_write(self, kind: str, key: str, data) -> None:
+        self._pending[(kind, key)] = data
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        # Let the other update_* calls of the same update_persistence run first
+        await asyncio.sleep(0)
+        delays = iter(WRITE_RETRY_DELAYS)
+        try:
+            while self._pending:
+                if await self._write_pending():
+                    delays = iter(WRITE_RETRY_DELAYS)
+                    continue
+                delay = next(delays, None)
+                if delay is None:
+                    # The rows stay pending and go out with the next write
+                    logger.error(f"Could not save {len(self._pending)} persistence rows")
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            self._flush_task = None
+
+    async def _write_pending(self) -> bool:
+        """Write the pending rows; on failure put them back and return False."""
+        if not self._pending:
+            return True
+        pending, self._pending = self._pending, {}
+        written = await save_persistence_rows(
+            [(kind, key, data) for (kind, key), data in pending.items()], self._origin
+        )
+        if written is None:
+            # Rows queued while the write was in flight are newer and win
+            self._pending = {**pending, **self._pending}
+            return False
+        for kind, key, version in written:
+            self._versions[(kind, key)] = version
+        for row_key, data in pending.items():
+            if data is None:
+                self._versions.pop(row_key, None)
+        return True
+
+
+async def refresh_persistent_state(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    persistence = context.application.persistence
+    if isinstance(persistence, PostgresPersistence):
+        await persistence.refresh_update(context.application, update)
+
+
+def _persistent_conversation_handlers(application: Application):
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler) and handler.persistent:
+                yield handler
+
+
+def _conversation_kind(name: str) -> str:
+    return f"conversation:{name}"
+
+
+# Registered in a group that runs before every other handler
+persistence_refresh_handler = TypeHandler(Update, refresh_persistent_state)
@@ -0,0 +1,189 @@
+import contextvars
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from psycopg2 import extensions
+from telegram.ext import Application
+
+from metrics import iter_callback_handlers
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: tag, time and count every query per update
+DB_TRACE = os.getenv("DB_TRACE", "false").lower() in ("1", "true", "yes")
+# Queries slower than this are logged with their parameters redacted
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+# Updates running more queries than this are flagged in their summary
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "5"))
+# The same statement this many times in one update is reported as a likely N+1
+DB_REPEAT_THRESHOLD = int(os.getenv("DB_REPEAT_THRESHOLD", "3"))
+
+_current_trace: contextvars.ContextVar["UpdateTrace | None"] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_current_handler: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_handler", default=None
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class UpdateTrace:
+    """Queries run on behalf of one update."""
+
+    def __init__(self, update_id: int) -> None:
+        self.update_id = update_id
+        self.queries = 0
+        self.db_time = 0.0
+        self.handlers: list[str] = []
+        self.statements: Counter[str] = Counter()
+        # Handlers may run several DB calls at once on the executor
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+            self.statements[statement] += 1
+
+    def enter_handler(self, name: str) -> None:
+        with self._lock:
+            self.handlers.append(name)
+
+    def log_summary(self) -> None:
+        handlers = ", ".join(self.handlers) or "none"
+        summary = (
+            f"Update {self.update_id}: {self.queries} queries, "
+            f"{self.db_time * 1000:.1f} ms in DB; handlers: {handlers}"
+        )
+        if self.queries > DB_QUERY_BUDGET:
+            logger.warning(f"{summary} (over the budget of {DB_QUERY_BUDGET})")
+        elif self.queries:
+            logger.info(summary)
+
+        for statement, count in self.statements.items():
+            if count >= DB_REPEAT_THRESHOLD:
+                logger.warning(
+                    f"Update {self.update_id}: statement ran {count} times, "
+                    f"possible N+1: {_shorten(statement)}"
+                )
+
+
+def _shorten(statement: str, limit: int = 200) -> str:
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def _normalize(query) -> str:
+    if isinstance(query, bytes):
+        # execute_values sends bytes with the rows already inlined; keep them out of logs
+        head, values, _ = query.partition(b"VALUES ")
+        query = (head + values + b"..." if values else query).decode(errors="replace")
+    return _WHITESPACE_RE.sub(" ", str(query)).strip()
+
+
+def _redact(value):
+    """Keep the shape of query parameters, never their values."""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return type(value)(_redact(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items()}
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def _tag(query):
+    """Prefix the SQL with a comment naming the update and handler, for pg logs."""
+    trace = _current_trace.get()
+    if trace is None:
+        return query
+    comment = f"/* update_id={trace.update_id} handler={_current_handler.get() or '-'} */ "
+    if isinstance(query, bytes):
+        return comment.encode() + query
+    if isinstance(query, str):
+        return comment + query
+    return query
+
+
+def _after_query(query, params, elapsed: float) -> None:
+    statement = _normalize(query)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(statement, elapsed)
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        where = (
+            f"update {trace.update_id} / {_current_handler.get() or '-'}"
+            if trace is not None
+            else "no update"
+        )
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms, {where}): {_shorten(statement)} "
+            f"params={_redact(params)}"
+        )
+
+
+class TracingCursor(extensions.cursor):
+    """psycopg2 cursor that tags, times and records every statement."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(_tag(query), vars)
+        finally:
+            _after_query(query, vars, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(_tag(query), vars_list)
+        finally:
+            _after_query(query, None, time.perf_counter() - started)
+
+
+def traced_handler(callback):
+    """Wrap a handler callback so queries it runs are attributed to it."""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.enter_handler(name)
+        token = _current_handler.set(name)
+        try:
+            return await callback(update, context)
+        finally:
+            _current_handler.reset(token)
+
+    return wrapper
+
+
+def trace_handlers(application: Application) -> None:
+    """Attribute queries to the handler callback that ran them."""
+    for handler in iter_callback_handlers(application):
+        handler.callback = traced_handler(handler.callback)
+
+
+class TracingApplication(Application):
+    """Application that opens a query trace around every update it processes."""
+
+    async def process_update(self, update: object) -> None:
+        update_id = getattr(update, "update_id", None)
+        if update_id is None:
+            await super().process_update(update)
+            return
+
+        trace = UpdateTrace(update_id)
+        token = _current_trace.set(trace)
+        try:
+            await super().process_update(update)
+        finally:
+            _current_trace.reset(token)
+            trace.log_summary()
@@ -0,0 +1,13 @@
+import admin_cache as admin_cache_module
+from admin_cache import AdminCache
+
+
+def test_failed_reload_keeps_previous_admins(monkeypatch):
+    monkeypatch.setattr(admin_cache_module, "get_all_admins", lambda: [(1, 42, None)])
+    cache = AdminCache()
+    cache.reload()
+
+    monkeypatch.setattr(admin_cache_module, "get_all_admins", lambda: None)
+    cache.reload()
+
+    assert cache.is_admin(42)
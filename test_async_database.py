@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import psycopg2
+import pytest
+
+import database
+from async_database import run_db
+
+SLOW_QUERY_SECONDS = 0.3
+
+
+def _slow_query(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def _pg_sleep(seconds: float) -> None:
+    with database.get_cursor() as cur:
+        cur.execute("SELECT pg_sleep(%s)", (seconds,))
+
+
+async def _timed_pair(func) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(
+        run_db(func, SLOW_QUERY_SECONDS), run_db(func, SLOW_QUERY_SECONDS)
+    )
+    return time.perf_counter() - started
+
+
+def test_slow_calls_overlap():
+    elapsed = asyncio.run(_timed_pair(_slow_query))
+    assert elapsed < SLOW_QUERY_SECONDS * 1.5
+
+
+def test_loop_keeps_running_during_query():
+    async def scenario() -> int:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await run_db(_slow_query, SLOW_QUERY_SECONDS)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 10
+
+
+def test_slow_postgres_queries_overlap():
+    try:
+        database.get_connection().close()
+    except psycopg2.Error:
+        pytest.skip("PostgreSQL is not reachable")
+    elapsed = asyncio.run(_timed_pair(_pg_sleep))
+    assert elapsed < SLOW_QUERY_SECONDS * 1.5
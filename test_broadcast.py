@@ -0,0 +1,71 @@
+import asyncio
+from collections import Counter
+
+import database
+from broadcast import BroadcastEngine
+
+
+class FakeBot:
+    def __init__(self, sent: Counter) -> None:
+        self.sent = sent
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0.001)
+        self.sent[chat_id] += 1
+        return None
+
+
+class FakeApplication:
+    def __init__(self, sent: Counter) -> None:
+        self.bot = FakeBot(sent)
+
+    def create_task(self, coroutine):
+        return asyncio.get_running_loop().create_task(coroutine)
+
+
+def _broadcast_status(broadcast_id: int) -> str:
+    with database.get_cursor() as cur:
+        cur.execute("SELECT status FROM broadcasts WHERE id = %s", (broadcast_id,))
+        return cur.fetchone()[0]
+
+
+def _create_broadcast(users: int) -> int:
+    for telegram_id in range(1, users + 1):
+        database.create_user(telegram_id, f"User {telegram_id}", f"+{telegram_id}")
+    return database.create_broadcast(999, "Hello")
+
+
+def test_workers_resuming_together_send_each_message_once(users_schema):
+    broadcast_id = _create_broadcast(30)
+    sent = Counter()
+
+    async def run_workers():
+        engines = [
+            BroadcastEngine(FakeApplication(sent), batch_size=7, lease_seconds=30)
+            for _ in range(3)
+        ]
+        await asyncio.gather(*(engine.resume() for engine in engines))
+        await asyncio.gather(*(task for engine in engines for task in engine._running.values()))
+
+    asyncio.run(run_workers())
+
+    assert {chat_id: count for chat_id, count in sent.items() if chat_id != 999} == {
+        telegram_id: 1 for telegram_id in range(1, 31)
+    }
+    assert _broadcast_status(broadcast_id) == "finished"
+
+
+def test_recipient_query_failure_leaves_broadcast_running(users_schema, monkeypatch):
+    broadcast_id = _create_broadcast(5)
+    monkeypatch.setattr(database, "get_pending_recipients", lambda *args: None)
+
+    async def run_worker():
+        engine = BroadcastEngine(FakeApplication(Counter()), lease_seconds=30)
+        await engine.resume()
+        await asyncio.gather(*engine._running.values())
+
+    asyncio.run(run_worker())
+
+    assert _broadcast_status(broadcast_id) == "running"
+    # The lease was released, so another worker can pick it up straight away
+    assert [row[0] for row in database.get_running_broadcasts()] == [broadcast_id]
@@ -0,0 +1,26 @@
+import database
+
+
+def _telegram_ids() -> set[int]:
+    with database.get_cursor() as cur:
+        cur.execute("SELECT telegram_id FROM users")
+        return {row[0] for row in cur.fetchall()}
+
+
+def test_delete_users_by_telegram_ids_counts_only_existing_rows(users_schema):
+    for telegram_id in range(1, 6):
+        database.create_user(telegram_id, f"User {telegram_id}", f"+{telegram_id}")
+
+    assert database.delete_users_by_telegram_ids([1, 3, 5, 99]) == 3
+    assert _telegram_ids() == {2, 4}
+    assert database.delete_users_by_telegram_ids([]) == 0
+
+
+def test_delete_videos_by_ids(users_schema):
+    for title in ("One", "Two", "Three"):
+        database.create_video(title, f"https://youtu.be/{title}")
+    first, second, third = (video_id for video_id, _, _ in database.get_all_videos_with_id())
+
+    assert database.delete_videos_by_ids([first, third]) == 2
+    assert [video_id for video_id, _ in database.get_videos_page(0, 10)] == [second]
+    assert database.delete_videos_by_ids([]) == 0
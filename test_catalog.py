@@ -0,0 +1,15 @@
+import catalog
+from catalog import VideoCatalog
+
+
+def test_failed_reload_keeps_previous_snapshot(monkeypatch):
+    videos = ((1, "Intro", "https://youtu.be/intro", None),)
+    monkeypatch.setattr(catalog, "load_all_videos", lambda: videos)
+    video_catalog = VideoCatalog()
+    video_catalog.reload()
+
+    monkeypatch.setattr(catalog, "load_all_videos", lambda: None)
+    video_catalog.reload()
+
+    assert video_catalog.snapshot.videos == videos
+    assert video_catalog.get_link("Intro") == "https://youtu.be/intro"
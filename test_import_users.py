@@ -0,0 +1,77 @@
+import io
+
+import database
+
+
+def _import(text: str):
+    return database.import_users_csv(io.BytesIO(text.encode()))
+
+
+def _users() -> dict:
+    with database.get_cursor() as cur:
+        cur.execute("SELECT telegram_id, name, phone FROM users")
+        return {telegram_id: (name, phone) for telegram_id, name, phone in cur.fetchall()}
+
+
+def test_import_inserts_updates_and_rejects(users_schema):
+    database.create_user(1, "Old Name", "+1")
+    database.create_user(2, "Same", "+2")
+
+    summary = _import(
+        "\ufeffName,Phone,Telegram_ID,extra\n"
+        "New Name,+1,1,x\n"
+        "Same,+2,2,x\n"
+        "Fresh,+3,3,x\n"
+        "No id,+4,abc,x\n"
+        ",+5,5,x\n"
+        "First,+6,6,x\n"
+        "Second,+66,6,x\n"
+    )
+
+    assert summary == {
+        "inserted": 2,
+        "updated": 1,
+        "unchanged": 1,
+        "rejected": 3,
+        "rejected_rows": [4, 5, 6],
+    }
+    assert _users() == {
+        1: ("New Name", "+1"),
+        2: ("Same", "+2"),
+        3: ("Fresh", "+3"),
+        6: ("Second", "+66"),
+    }
+
+
+def test_export_round_trips_through_import(users_schema):
+    for telegram_id in range(1, 4):
+        database.create_user(telegram_id, f"User {telegram_id}", f"+{telegram_id}")
+    exported = io.BytesIO()
+    assert database.export_users_csv(exported) == 3
+
+    exported.seek(0)
+    summary = database.import_users_csv(exported)
+
+    assert summary["inserted"] == summary["updated"] == summary["rejected"] == 0
+    assert summary["unchanged"] == 3
+
+
+def test_extra_columns_may_use_any_name(users_schema):
+    summary = _import("line,telegram_id,name,phone,note,note\n1,7,Ann,+7,a,b\n")
+
+    assert summary["inserted"] == 1
+    assert _users() == {7: ("Ann", "+7")}
+
+
+def test_import_without_required_columns_fails(users_schema):
+    assert _import("telegram_id,name\n1,Ann\n") is None
+    assert _users() == {}
+
+
+def test_rows_with_wrong_field_count_are_rejected(users_schema):
+    summary = _import("telegram_id,name,phone\n1,Ann,+1\n2,Bob\n3,Cid,+3,extra\n4,Dan,+4\n5\n")
+
+    assert summary["inserted"] == 2
+    assert summary["rejected"] == 3
+    assert summary["rejected_rows"] == [2, 3, 5]
+    assert _users() == {1: ("Ann", "+1"), 4: ("Dan", "+4")}
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from loop_watchdog import LoopWatchdog
+
+
+def _block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def test_blocking_call_is_caught_with_its_stack():
+    async def scenario() -> LoopWatchdog:
+        watchdog = LoopWatchdog(interval=0.02, threshold=0.1)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        _block_loop(0.4)
+        await asyncio.sleep(0.1)
+        await watchdog.stop()
+        return watchdog
+
+    watchdog = asyncio.run(scenario())
+    assert watchdog.blocks == 1
+    assert any("_block_loop" in line for line in watchdog.last_block_stack)
+    assert watchdog.lag_percentiles()["max"] >= 300
+
+
+def test_idle_loop_reports_no_blocks():
+    async def scenario() -> LoopWatchdog:
+        watchdog = LoopWatchdog(interval=0.02, threshold=0.1)
+        watchdog.start()
+        await asyncio.sleep(0.3)
+        await watchdog.stop()
+        return watchdog
+
+    watchdog = asyncio.run(scenario())
+    assert watchdog.blocks == 0
+    assert watchdog.stats()["lag_ms"]["p50"] < 50
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import database
+from migrations import LATEST_VERSION
+
+# (query, params, index the planner must be able to use)
+HOT_QUERIES = [
+    (
+        "SELECT id, title, youtube_link, created_at FROM videos WHERE title = %s",
+        ("Intro",),
+        "videos_title_idx",
+    ),
+    (
+        "SELECT id, telegram_id, name, phone, created_at FROM users WHERE telegram_id = %s",
+        (42,),
+        "users_telegram_id_key",
+    ),
+    (
+        "SELECT id, name, phone, telegram_id FROM users WHERE id > %s ORDER BY id LIMIT %s",
+        (0, 10),
+        "users_pkey",
+    ),
+    (
+        "SELECT id, name, phone, telegram_id FROM users WHERE name ILIKE %s",
+        ("%ann%",),
+        "users_name_trgm_idx",
+    ),
+    (
+        "SELECT id, title FROM videos WHERE %s <%% title",
+        ("quadratic",),
+        "videos_title_trgm_idx",
+    ),
+    (
+        "SELECT telegram_id FROM broadcast_recipients "
+        "WHERE broadcast_id = %s AND status = 'pending' AND telegram_id > %s "
+        "ORDER BY telegram_id LIMIT %s",
+        (1, 0, 500),
+        "broadcast_recipients_pending_idx",
+    ),
+]
+
+
+def _trgm_installed() -> bool:
+    with database.get_cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cur.fetchone() is not None
+
+
+def _plan_indexes(plan: dict) -> set[str]:
+    found = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+def test_migrate_reaches_latest_version(migrated_schema):
+    # Without pg_trgm the trigram migration is a no-op, not a stopping point
+    assert migrated_schema == LATEST_VERSION
+    assert database.get_schema_version() == LATEST_VERSION
+    # A second run changes nothing
+    assert database.migrate() == LATEST_VERSION
+
+
+@pytest.mark.parametrize("query, params, index", HOT_QUERIES)
+def test_hot_queries_use_indexes(migrated_schema, query, params, index):
+    if "trgm" in index and not _trgm_installed():
+        pytest.skip("pg_trgm is not available on this server")
+    with database.get_cursor() as cur:
+        # Empty tables make sequential scans look free; rule them out to
+        # check that a usable index exists for the query
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+    assert index in _plan_indexes(plan[0]["Plan"])
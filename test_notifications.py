@@ -0,0 +1,23 @@
+import threading
+
+import psycopg2
+import pytest
+
+import database
+from notifications import NotificationListener
+
+
+def test_resync_runs_once_listen_is_first_established():
+    try:
+        database.get_connection().close()
+    except psycopg2.Error:
+        pytest.skip("PostgreSQL is not reachable")
+
+    resynced = threading.Event()
+    listener = NotificationListener()
+    listener.subscribe("test_channel", lambda payload: None, resync=resynced.set)
+    listener.start()
+    try:
+        assert resynced.wait(5)
+    finally:
+        listener.stop()
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from outbound import BULK_LANE, INTERACTIVE_LANE, OutboundScheduler
+
+
+def _scheduler(**overrides) -> OutboundScheduler:
+    settings = dict(
+        global_rate=20, bulk_rate=20, chat_rate=100, group_rate=100, chat_burst=100, max_retries=2
+    )
+    settings.update(overrides)
+    return OutboundScheduler(**settings)
+
+
+def test_interactive_lane_overtakes_queued_bulk_sends():
+    async def scenario() -> list[str]:
+        scheduler = _scheduler()
+        await scheduler.initialize()
+        order = []
+
+        def send(label: str, chat_id: int, lane: str):
+            async def callback():
+                order.append(label)
+                return True
+
+            return scheduler.process_request(
+                callback, (), {}, "sendMessage", {"chat_id": chat_id}, lane
+            )
+
+        bulk = [
+            asyncio.ensure_future(send(f"bulk{i}", 1000 + i, BULK_LANE)) for i in range(40)
+        ]
+        # Let the bulk sends drain the burst and start queueing
+        await asyncio.sleep(0.2)
+        await send("reply", 1, INTERACTIVE_LANE)
+        await asyncio.gather(*bulk)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order.index("reply") < 30
+
+
+def test_retry_after_is_retried_centrally():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.initialize()
+        attempts = 0
+
+        async def callback():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RetryAfter(0)
+            return True
+
+        result = await scheduler.process_request(
+            callback, (), {}, "sendMessage", {"chat_id": 7}, None
+        )
+        return result, attempts
+
+    assert asyncio.run(scenario()) == (True, 2)
+
+
+def test_gives_up_after_max_retries():
+    async def scenario():
+        scheduler = _scheduler(max_retries=1)
+        await scheduler.initialize()
+
+        async def callback():
+            raise RetryAfter(0)
+
+        await scheduler.process_request(callback, (), {}, "sendMessage", {"chat_id": 7}, None)
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(scenario())
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from telegram.ext import ApplicationBuilder
+
+import database
+import persistence as persistence_module
+from notifications import notification_listener
+from persistence import PostgresPersistence
+
+
+def _update(user_id: int):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_refresh_queries_only_after_another_worker_writes(users_schema, monkeypatch):
+    loads = []
+    real_load = database.load_persistence_rows
+
+    def counting_load(keys):
+        loads.append(keys)
+        return real_load(keys)
+
+    monkeypatch.setattr(database, "load_persistence_rows", counting_load)
+
+    writer, reader = PostgresPersistence(), PostgresPersistence()
+    application = ApplicationBuilder().token("123:TEST").persistence(reader).build()
+    reader.start()
+    notification_listener.start()
+    try:
+        # Let the listener run LISTEN before the first write
+        time.sleep(0.3)
+
+        async def scenario():
+            await reader.refresh_update(application, _update(7))
+            await reader.refresh_update(application, _update(7))
+            assert len(loads) == 1
+
+            await writer.update_user_data(7, {"users_selected": [1, 2]})
+            await writer.flush()
+            assert _wait_for(lambda: 7 not in reader._fresh)
+
+            await reader.refresh_update(application, _update(7))
+            assert len(loads) == 2
+            assert application.user_data[7] == {"users_selected": [1, 2]}
+
+        asyncio.run(scenario())
+    finally:
+        notification_listener.stop()
+
+
+def test_failed_load_keeps_state_and_retries(users_schema, monkeypatch):
+    persistence = PostgresPersistence()
+    application = ApplicationBuilder().token("123:TEST").persistence(persistence).build()
+    application.user_data[7]["full_name"] = "Ann"
+    persistence._listening = True
+    monkeypatch.setattr(database, "load_persistence_rows", lambda keys: None)
+
+    asyncio.run(persistence.refresh_update(application, _update(7)))
+
+    assert application.user_data[7] == {"full_name": "Ann"}
+    assert 7 not in persistence._fresh
+
+
+def test_failed_save_keeps_rows_and_retries(monkeypatch):
+    saves = []
+
+    async def flaky_save(rows, origin=""):
+        saves.append(rows)
+        if len(saves) == 1:
+            # A newer write for user 7 arrives while the first save is failing
+            await persistence.update_user_data(7, {"full_name": "Ann B"})
+            return None
+        return [(kind, key, 1) for kind, key, data in rows if data is not None]
+
+    monkeypatch.setattr(persistence_module, "save_persistence_rows", flaky_save)
+    monkeypatch.setattr(persistence_module, "WRITE_RETRY_DELAYS", (0,))
+    persistence = PostgresPersistence()
+
+    async def scenario():
+        await persistence.update_user_data(7, {"full_name": "Ann"})
+        await persistence.update_user_data(8, {"full_name": "Bob"})
+        await persistence.flush()
+
+    asyncio.run(scenario())
+
+    assert len(saves) == 2
+    assert sorted(saves[1]) == [
+        ("user_data", "7", {"full_name": "Ann B"}),
+        ("user_data", "8", {"full_name": "Bob"}),
+    ]
+    assert persistence._pending == {}
+    assert persistence._versions == {("user_data", "7"): 1, ("user_data", "8"): 1}
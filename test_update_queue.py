@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+from update_queue import UpdateQueue
+
+
+def _update(update_id: int, chat_id: int):
+    return SimpleNamespace(
+        update_id=update_id, effective_chat=SimpleNamespace(id=chat_id), effective_user=None
+    )
+
+
+class FakeApplication:
+    def __init__(self, delay=lambda update: 0) -> None:
+        self.delay = delay
+        self.processed = []
+
+    async def process_update(self, update) -> None:
+        await asyncio.sleep(self.delay(update))
+        self.processed.append(update.update_id)
+
+
+def test_updates_from_one_chat_run_in_arrival_order():
+    # Earlier updates take longer, so any reordering within a chat would show
+    application = FakeApplication(delay=lambda update: (20 - update.update_id) * 0.002)
+
+    async def scenario():
+        queue = UpdateQueue(application, maxsize=100, workers=4)
+        await queue.start()
+        for update_id in range(20):
+            assert queue.put(_update(update_id, chat_id=update_id % 3))
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    for chat_id in range(3):
+        chat_updates = [update_id for update_id in application.processed if update_id % 3 == chat_id]
+        assert chat_updates == sorted(chat_updates)
+    assert len(application.processed) == 20
+
+
+def test_put_returns_false_when_full_or_not_started():
+    async def scenario():
+        gate = asyncio.Event()
+
+        class BlockedApplication:
+            async def process_update(self, update) -> None:
+                await gate.wait()
+
+        queue = UpdateQueue(BlockedApplication(), maxsize=2, workers=1)
+        assert not queue.put(_update(0, chat_id=1))
+
+        await queue.start()
+        assert queue.put(_update(1, chat_id=1))
+        assert queue.put(_update(2, chat_id=1))
+        assert not queue.put(_update(3, chat_id=1))
+        stats = queue.stats()
+        assert (stats["accepted"], stats["rejected"]) == (2, 2)
+
+        gate.set()
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_drains_queued_updates_and_counts_failures():
+    class FailingApplication(FakeApplication):
+        async def process_update(self, update) -> None:
+            if update.update_id == 3:
+                raise RuntimeError("handler failed")
+            await super().process_update(update)
+
+    application = FailingApplication(delay=lambda update: 0.01)
+
+    async def scenario():
+        queue = UpdateQueue(application, maxsize=100, workers=2)
+        await queue.start()
+        for update_id in range(10):
+            queue.put(_update(update_id, chat_id=update_id))
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert sorted(application.processed) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert stats["processed"] == 9 and stats["failed"] == 1 and stats["depth"] == 0
@@ -0,0 +1,16 @@
+from array import array
+
+import user_registry as user_registry_module
+from user_registry import UserRegistry
+
+
+def test_failed_reload_keeps_previous_ids(monkeypatch):
+    monkeypatch.setattr(user_registry_module, "get_user_telegram_ids", lambda: array("q", [1, 2]))
+    registry = UserRegistry()
+    registry.reload()
+
+    monkeypatch.setattr(user_registry_module, "get_user_telegram_ids", lambda: None)
+    registry.reload()
+
+    assert 1 in registry and 2 in registry
+    assert len(registry) == 2
@@ -0,0 +1,38 @@
+from video_search import VideoSearchIndex
+
+VIDEOS = [
+    (1, "Introduction to Python"),
+    (2, "Advanced Python decorators"),
+    (3, "Interview preparation"),
+    (4, "Databases for beginners"),
+    (5, "Python"),
+]
+
+
+def _ids(results) -> list[int]:
+    return [video[0] for video in results]
+
+
+def test_short_query_matches_word_prefixes():
+    index = VideoSearchIndex(VIDEOS)
+
+    assert sorted(_ids(index.search("in"))) == [1, 3]
+    assert _ids(index.search("da")) == [4]
+
+
+def test_trigram_search_tolerates_typos_and_ranks_exact_matches_first():
+    index = VideoSearchIndex(VIDEOS)
+
+    assert _ids(index.search("decoraters")) == [2]
+    assert set(_ids(index.search("pyhton"))) == {1, 2, 5}
+    # Titles containing the whole query outrank ones that only share trigrams
+    assert _ids(index.search("python decorators"))[0] == 2
+    assert _ids(index.search("interview prep")) == [3]
+
+
+def test_search_respects_limit():
+    index = VideoSearchIndex(VIDEOS)
+
+    assert len(index.search("python", limit=2)) == 2
+    assert _ids(index.search("", limit=3)) == [1, 2, 3]
+    assert index.search("zzzz") == []
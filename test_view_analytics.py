@@ -0,0 +1,75 @@
+import asyncio
+
+import view_analytics
+from view_analytics import ViewRecorder
+
+
+def _stub_writes(monkeypatch, results=()):
+    """Record every batch handed to record_video_views; fail while `results` says so."""
+    batches = []
+    outcomes = iter(results)
+
+    async def record_video_views(views):
+        batches.append([(video_id, telegram_id) for video_id, telegram_id, _ in views])
+        return next(outcomes, True)
+
+    monkeypatch.setattr(view_analytics, "record_video_views", record_video_views)
+    return batches
+
+
+def test_flush_writes_in_batches(monkeypatch):
+    batches = _stub_writes(monkeypatch)
+    recorder = ViewRecorder(capacity=100, batch_size=2)
+    for telegram_id in range(5):
+        recorder.record(telegram_id, video_id=9)
+
+    asyncio.run(recorder.flush())
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert len(recorder) == 0
+
+
+def test_full_batch_wakes_the_writer_before_the_interval(monkeypatch):
+    batches = _stub_writes(monkeypatch)
+
+    async def scenario():
+        recorder = ViewRecorder(capacity=100, batch_size=3, interval=60)
+        recorder.start()
+        for telegram_id in range(3):
+            recorder.record(telegram_id, video_id=9)
+        await asyncio.sleep(0.05)
+        assert batches == [[(9, 0), (9, 1), (9, 2)]]
+        await recorder.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_requeues_events_in_order(monkeypatch):
+    batches = _stub_writes(monkeypatch, results=[False])
+    recorder = ViewRecorder(capacity=100, batch_size=2)
+    for telegram_id in range(3):
+        recorder.record(telegram_id, video_id=9)
+
+    asyncio.run(recorder.flush())
+    assert len(recorder) == 3
+
+    asyncio.run(recorder.flush())
+    assert batches == [[(9, 0), (9, 1)], [(9, 0), (9, 1)], [(9, 2)]]
+    assert len(recorder) == 0
+
+
+def test_failed_flush_requeues_only_what_fits(monkeypatch):
+    recorder = ViewRecorder(capacity=3, batch_size=2)
+    for telegram_id in range(3):
+        recorder.record(telegram_id, video_id=9)
+
+    async def record_video_views(views):
+        # A new event arrives while the failing write is in flight
+        recorder.record(10, video_id=9)
+        return False
+
+    monkeypatch.setattr(view_analytics, "record_video_views", record_video_views)
+    asyncio.run(recorder.flush())
+
+    # One slot is left, so only the newer event of the failed batch goes back
+    assert [telegram_id for _, telegram_id, _ in recorder._buffer] == [1, 2, 10]
@@ -0,0 +1,45 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import asgi
+from dedup import UpdateDeduplicator
+from webhook_filter import WEBHOOK_FILTER_KEY
+
+UPDATE = {
+    "update_id": 501,
+    "message": {"message_id": 1, "date": 0, "chat": {"id": 7, "type": "private"}},
+}
+
+
+class AcceptAll:
+    def wants(self, update_data) -> bool:
+        return True
+
+
+def _app(process_update):
+    return SimpleNamespace(
+        bot_data={WEBHOOK_FILTER_KEY: AcceptAll()}, bot=None, process_update=process_update
+    )
+
+
+def test_failed_update_is_processed_when_redelivered(monkeypatch):
+    calls = []
+
+    async def process_update(update):
+        calls.append(update.update_id)
+        if len(calls) == 1:
+            raise RuntimeError("handler crashed")
+
+    monkeypatch.setattr(asgi, "update_deduplicator", UpdateDeduplicator(store="memory"))
+    monkeypatch.setattr(asgi, "telegram_app", _app(process_update))
+    monkeypatch.setattr(asgi, "update_queue", None)
+    body = json.dumps(UPDATE).encode()
+
+    assert asyncio.run(asgi.webhook(body)) == 500
+    # Telegram's redelivery must be processed, not dropped as a duplicate
+    assert asyncio.run(asgi.webhook(body)) == 200
+    assert calls == [501, 501]
+    # Once it has succeeded, further copies are duplicates
+    assert asyncio.run(asgi.webhook(body)) == 200
+    assert calls == [501, 501]
@@ -0,0 +1,61 @@
+from telegram import Update
+from telegram.ext import (
+    ApplicationBuilder,
+    CallbackQueryHandler,
+    CommandHandler,
+    ConversationHandler,
+    MessageHandler,
+    PollAnswerHandler,
+    TypeHandler,
+    filters,
+)
+
+from webhook_filter import WebhookFilter
+
+
+async def _noop(update, context):
+    return None
+
+
+def _application(*handlers):
+    application = ApplicationBuilder().token("123:TEST").build()
+    application.add_handler(TypeHandler(Update, _noop), group=-1)
+    for handler in handlers:
+        application.add_handler(handler)
+    return application
+
+
+def _filter(*handlers) -> WebhookFilter:
+    return WebhookFilter(_application(*handlers), secret="s3cret")
+
+
+def test_check_secret():
+    webhook_filter = _filter(CommandHandler("start", _noop))
+
+    assert webhook_filter.check_secret("s3cret")
+    assert webhook_filter.check_secret(b"s3cret")
+    assert not webhook_filter.check_secret("wrong")
+    assert not webhook_filter.check_secret(None)
+    assert webhook_filter.stats()["rejected"] == 2
+
+
+def test_allowed_updates_follow_registered_handlers():
+    conversation = ConversationHandler(
+        entry_points=[CommandHandler("start", _noop)],
+        states={1: [CallbackQueryHandler(_noop)]},
+        fallbacks=[MessageHandler(filters.TEXT, _noop)],
+    )
+
+    assert _filter(conversation).allowed_updates == [Update.CALLBACK_QUERY, Update.MESSAGE]
+    assert _filter(CommandHandler("start", _noop)).allowed_updates == [Update.MESSAGE]
+    # A handler the filter does not know about lets every update type through
+    assert _filter(PollAnswerHandler(_noop)).allowed_updates == list(Update.ALL_TYPES)
+
+
+def test_updates_without_a_handler_are_dropped():
+    webhook_filter = _filter(CommandHandler("start", _noop))
+
+    assert webhook_filter.wants({"update_id": 1, "message": {}})
+    assert not webhook_filter.wants({"update_id": 2, "edited_message": {}})
+    assert not webhook_filter.wants({"update_id": 3, "callback_query": {}})
+    assert webhook_filter.stats()["discarded"] == 2
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import threading
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """Bounded queue between the webhook and the bot loop.
+
+    Updates are sharded by chat, one worker per shard, so updates from the
+    same chat are processed in arrival order while different chats run
+    concurrently. `put` may be called from any thread.
+    """
+
+    def __init__(self, application: Application, maxsize: int, workers: int) -> None:
+        self.application = application
+        self.maxsize = maxsize
+        self.workers = workers
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._shards: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._in_flight = 0
+        self._accepted = 0
+        self._rejected = 0
+        self._processed = 0
+        self._failed = 0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._shards = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(shard)) for shard in self._shards
+        ]
+
+    async def stop(self) -> None:
+        """Refuse new updates and wait for every accepted one to be processed."""
+        with self._lock:
+            self._loop = None
+        # Let the put_nowait calls scheduled by accepted puts reach their shards
+        await asyncio.sleep(0)
+        for shard in self._shards:
+            await shard.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def put(self, update: Update) -> bool:
+        """Enqueue an update; returns False when the queue is full."""
+        with self._lock:
+            if self._loop is None or self._depth >= self.maxsize:
+                self._rejected += 1
+                return False
+            self._depth += 1
+            self._accepted += 1
+            shard = self._shards[_ordering_key(update) % self.workers]
+            # Scheduled under the lock, so stop() cannot miss an accepted update
+            self._loop.call_soon_threadsafe(shard.put_nowait, update)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "depth": self._depth,
+                "capacity": self.maxsize,
+                "in_flight": self._in_flight,
+                "accepted": self._accepted,
+                "rejected": self._rejected,
+                "processed": self._processed,
+                "failed": self._failed,
+                "shard_depths": [shard.qsize() for shard in self._shards],
+            }
+
+    async def _worker(self, shard: asyncio.Queue) -> None:
+        while True:
+            update = await shard.get()
+            with self._lock:
+                self._depth -= 1
+                self._in_flight += 1
+            try:
+                await self.application.process_update(update)
+                failed = False
+            except Exception as exc:
+                logger.error(f"Error processing update {update.update_id}: {exc}")
+                failed = True
+            finally:
+                shard.task_done()
+            with self._lock:
+                self._in_flight -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._processed += 1
+
+
+def _ordering_key(update: Update) -> int:
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return update.update_id
@@ -0,0 +1,82 @@
+import heapq
+import re
+from bisect import bisect_left
+
+# Same cut-off pg_trgm uses for its similarity operators
+MIN_SIMILARITY = 0.3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def _trigrams(text: str) -> set[str]:
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class VideoSearchIndex:
+    """Prefix and trigram index over video titles.
+
+    Short queries are answered from a sorted list of title words by binary
+    search; longer ones by counting shared trigrams, so typos still match.
+    Built once per catalog snapshot, queried without locks or I/O.
+    """
+
+    def __init__(self, videos) -> None:
+        self.videos = tuple(videos)
+        self._titles = [_normalize(video[1]) for video in self.videos]
+        self._words: list[tuple[str, int]] = sorted(
+            (word, index)
+            for index, title in enumerate(self._titles)
+            for word in set(title.split())
+        )
+        self._postings: dict[str, list[int]] = {}
+        self._gram_counts: list[int] = []
+        for index, title in enumerate(self._titles):
+            grams = _trigrams(title)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(index)
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Return up to `limit` videos, best match first."""
+        query = _normalize(query)
+        if not query:
+            return list(self.videos[:limit])
+
+        scores: dict[int, float] = {}
+        for index in self._prefix_matches(query.split()[-1]):
+            scores[index] = 1.0
+
+        grams = _trigrams(query)
+        if len(query) >= 3 and grams:
+            shared: dict[int, int] = {}
+            for gram in grams:
+                for index in self._postings.get(gram, ()):
+                    shared[index] = shared.get(index, 0) + 1
+            for index, count in shared.items():
+                similarity = count / (len(grams) + self._gram_counts[index] - count)
+                # Word similarity: how much of the query appears in the title
+                coverage = count / len(grams)
+                score = max(similarity, coverage)
+                if score >= MIN_SIMILARITY:
+                    scores[index] = max(scores.get(index, 0.0), score)
+
+        for index in scores:
+            if query in self._titles[index]:
+                scores[index] += 1.0
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [self.videos[index] for index, _ in best]
+
+    def _prefix_matches(self, prefix: str):
+        position = bisect_left(self._words, (prefix, -1))
+        while position < len(self._words) and self._words[position][0].startswith(prefix):
+            yield self._words[position][1]
+            position += 1
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from async_database import record_video_views
+from config import VIEW_BUFFER_SIZE, VIEW_FLUSH_BATCH, VIEW_FLUSH_INTERVAL
+from metrics import Counter, GaugeFunc
+
+logger = logging.getLogger(__name__)
+
+views_dropped = Counter(
+    "bot_video_views_dropped_total", "View events lost because the buffer was full."
+)
+views_flushed = Counter("bot_video_views_flushed_total", "View events written to Postgres.")
+
+
+class ViewRecorder:
+    """Write-behind buffer for video view events.
+
+    Handlers call `record`, which only appends to a bounded deque. A task on
+    the bot loop writes the events in batches of `batch_size` once a batch
+    is full or every `interval` seconds, whichever comes first. A crash loses
+    at most the events of the last interval; when Postgres is unreachable
+    the buffer fills up and the oldest events are dropped.
+    """
+
+    def __init__(
+        self,
+        capacity: int = VIEW_BUFFER_SIZE,
+        batch_size: int = VIEW_FLUSH_BATCH,
+        interval: float = VIEW_FLUSH_INTERVAL,
+    ) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer: deque[tuple[int, int, float]] = deque(maxlen=capacity)
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def record(self, telegram_id: int, video_id: int) -> None:
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            views_dropped.inc()
+        buffer.append((video_id, telegram_id, time.time()))
+        if self._wake is not None and len(buffer) >= self.batch_size:
+            self._wake.set()
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything buffered so far, a batch per transaction."""
+        buffer = self._buffer
+        while buffer:
+            raw = [buffer.popleft() for _ in range(min(self.batch_size, len(buffer)))]
+            # Naive UTC, to match the TIMESTAMP column
+            views = [
+                (video_id, telegram_id, _utc(at))
+                for video_id, telegram_id, at in raw
+            ]
+            if not await record_video_views(views):
+                # Keep them for the next round, unless newer events need the room
+                room = buffer.maxlen - len(buffer)
+                buffer.extendleft(reversed(raw[-room:] if room else []))
+                return
+            views_flushed.inc(amount=len(views))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error(f"Failed to flush video views: {exc}")
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+view_recorder = ViewRecorder()
+
+GaugeFunc(
+    "bot_video_views_buffered", "View events waiting to be written.", lambda: len(view_recorder)
+)
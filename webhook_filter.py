@@ -0,0 +1,113 @@
+import hashlib
+import hmac
+import logging
+
+from telegram import Update
+from telegram.ext import (
+    Application,
+    BaseHandler,
+    CallbackQueryHandler,
+    CommandHandler,
+    ConversationHandler,
+    InlineQueryHandler,
+    MessageHandler,
+    TypeHandler,
+)
+
+from config import BOT_TOKEN, WEBHOOK_SECRET_TOKEN
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_FILTER_KEY = "webhook_filter"
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Update kinds each handler class can match. Edited messages are left out on
+# purpose: none of the conversations should react to a user editing old text.
+_HANDLER_KINDS = {
+    CommandHandler: (Update.MESSAGE,),
+    MessageHandler: (Update.MESSAGE,),
+    CallbackQueryHandler: (Update.CALLBACK_QUERY,),
+    InlineQueryHandler: (Update.INLINE_QUERY,),
+}
+
+
+def _default_secret() -> str:
+    # Same value in every worker, so all of them accept what set_webhook registered
+    return hashlib.sha256(f"webhook:{BOT_TOKEN}".encode()).hexdigest()
+
+
+def _handler_kinds(handler: BaseHandler):
+    if isinstance(handler, ConversationHandler):
+        nested = [*handler.entry_points, *handler.fallbacks]
+        for handlers in handler.states.values():
+            nested.extend(handlers)
+        kinds = set()
+        for inner in nested:
+            inner_kinds = _handler_kinds(inner)
+            if inner_kinds is None:
+                return None
+            kinds.update(inner_kinds)
+        return kinds
+    for handler_type, kinds in _HANDLER_KINDS.items():
+        if isinstance(handler, handler_type):
+            return set(kinds)
+    return None
+
+
+class WebhookFilter:
+    """Cheap checks that run on a webhook request before Update.de_json.
+
+    The secret header is compared before the body is parsed, and payloads
+    whose update kind no handler can match are dropped after a plain dict
+    lookup. `allowed_updates` is what setup_webhook passes to Telegram, so
+    those payloads should only arrive from a stale webhook registration.
+    """
+
+    def __init__(self, application: Application, secret: str = WEBHOOK_SECRET_TOKEN) -> None:
+        self.secret = secret or _default_secret()
+        self._secret_bytes = self.secret.encode()
+        self.allowed_updates = self._collect_kinds(application)
+        self._allowed = frozenset(self.allowed_updates)
+        self.rejected = 0
+        self.discarded = 0
+
+    def check_secret(self, header_value) -> bool:
+        if header_value is None:
+            self.rejected += 1
+            return False
+        if isinstance(header_value, str):
+            header_value = header_value.encode()
+        if not hmac.compare_digest(header_value, self._secret_bytes):
+            self.rejected += 1
+            return False
+        return True
+
+    def wants(self, update_data) -> bool:
+        """Return False for payloads no registered handler would match."""
+        if not isinstance(update_data, dict):
+            return True
+        for key in update_data:
+            if key in self._allowed:
+                return True
+        self.discarded += 1
+        return False
+
+    def stats(self) -> dict:
+        return {"rejected": self.rejected, "discarded": self.discarded}
+
+    @staticmethod
+    def _collect_kinds(application: Application) -> list[str]:
+        kinds = set()
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                # Pre-processing hooks run for every update but do not need one
+                if isinstance(handler, TypeHandler):
+                    continue
+                handler_kinds = _handler_kinds(handler)
+                if handler_kinds is None:
+                    logger.warning(
+                        f"Unknown handler {type(handler).__name__}, allowing all update types"
+                    )
+                    return list(Update.ALL_TYPES)
+                kinds.update(handler_kinds)
+        return sorted(kinds)